@@ -1,9 +1,30 @@
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, abort, Response, stream_with_context
 import pdf417gen
+from pdf417gen.compaction import compact, BYTE_LATCH, BYTE_LATCH_ALT
+from pdf417gen.compaction.byte import compact_bytes
+from pdf417gen.encoding import encode_rows, get_padding, validate_barcode_size
+from pdf417gen.data import CHARACTERS_LOOKUP, ERROR_CORRECTION_FACTORS, SWITCH_CODES
+from pdf417gen.util import chunks as split_every, to_base
 import qrcode
 import io
+import os
+import lzma
+import zlib
 import base64
+import binascii
+import codecs
+import hashlib
+import json
 import math
+import re
+import struct
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+import numpy as np
 from PIL import Image
 
 app = Flask(__name__)
@@ -137,7 +158,8 @@ HTML = """<!DOCTYPE html>
     font-size: 0.72rem;
     color: var(--muted);
     display: flex;
-    gap: 16px;
+    flex-wrap: wrap;
+    gap: 4px 16px;
     margin-top: 6px;
   }
   .live-stats span { color: var(--accent); }
@@ -204,6 +226,14 @@ HTML = """<!DOCTYPE html>
     outline: none;
   }
   input[type="number"]:focus { border-color: var(--accent2); }
+  .chunk-auto {
+    display: flex;
+    align-items: center;
+    gap: 6px;
+    margin: 0;
+    cursor: pointer;
+  }
+  .chunk-auto input { accent-color: var(--accent); }
   .chunk-hint {
     font-family: var(--font-mono);
     font-size: 0.68rem;
@@ -441,6 +471,21 @@ HTML = """<!DOCTYPE html>
     letter-spacing: 0.08em;
   }
 
+  /* Re-send missing frames */
+  .resend-input {
+    flex: 1;
+    min-width: 180px;
+    background: var(--bg);
+    border: 1px solid var(--border);
+    border-radius: 4px;
+    color: var(--accent);
+    font-family: var(--font-mono);
+    font-size: 0.82rem;
+    padding: 8px 10px;
+    outline: none;
+  }
+  .resend-input:focus { border-color: var(--accent2); }
+
   /* ─── Footer ─── */
   footer {
     border-top: 1px solid var(--border);
@@ -482,7 +527,9 @@ HTML = """<!DOCTYPE html>
       <textarea id="inputText" placeholder="Paste your text here..."></textarea>
       <div class="live-stats">
         <div>chars: <span id="charCount">0</span></div>
-        <div>chunks: <span id="chunkCount">0</span></div>
+        <div>frames: <span id="chunkCount">0</span></div>
+        <div>symbol: <span id="planSymbol">–</span></div>
+        <div>response: <span id="planSize">–</span></div>
       </div>
     </div>
 
@@ -496,6 +543,32 @@ HTML = """<!DOCTYPE html>
       </div>
     </div>
 
+    <div id="pdf417-options">
+      <label>PDF417 Columns</label>
+      <select id="pdf417-columns">
+        <option value="auto" selected>auto — fill the display at this scale</option>
+        <option value="4">4</option>
+        <option value="6">6</option>
+        <option value="8">8</option>
+        <option value="12">12</option>
+        <option value="16">16</option>
+        <option value="24">24</option>
+        <option value="30">30</option>
+      </select>
+      <label style="margin-top:10px">PDF417 Security Level</label>
+      <div class="chunk-row">
+        <select id="pdf417-security">
+          <option value="auto">auto — spec minimum per frame</option>
+          <option value="0">0</option><option value="1">1</option>
+          <option value="2" selected>2</option><option value="3">3</option>
+          <option value="4">4</option><option value="5">5</option>
+          <option value="6">6</option><option value="7">7</option>
+          <option value="8">8</option>
+        </select>
+        <input type="number" id="pdf417-floor" value="0" min="0" max="8" step="1" title="lowest level auto may pick" disabled>
+      </div>
+    </div>
+
     <div id="qr-options">
       <label>QR Error Correction</label>
       <select id="qr-ecc">
@@ -504,16 +577,69 @@ HTML = """<!DOCTYPE html>
         <option value="Q">Q — Quartile (~25% recovery)</option>
         <option value="H">H — High (~30% recovery)</option>
       </select>
+      <label style="margin-top:10px">QR Version / Mask</label>
+      <select id="qr-mask">
+        <option value="pin" selected>pinned — one version + mask per job</option>
+        <option value="auto">per frame — best fit + 8-mask search</option>
+      </select>
     </div>
 
     <div>
       <label>Chunk Size (chars)</label>
       <div class="chunk-row">
-        <input type="number" id="chunk-size" value="1180" min="100" max="2800" step="10">
-        <span class="chunk-hint">PDF417 max ~1800<br>QR max ~2800</span>
+        <input type="number" id="chunk-size" value="1180" min="100" max="2800" step="10" disabled>
+        <label class="chunk-auto"><input type="checkbox" id="chunk-auto" checked> auto</label>
+        <span class="chunk-hint">auto fills each<br>frame to capacity</span>
       </div>
     </div>
 
+    <div>
+      <label>Sequencing</label>
+      <select id="sequence">
+        <option value="text" selected>text header — [NNN/TOTAL] prefix</option>
+        <option value="compact">compact header — digits with job id and CRC</option>
+        <option value="native">native — Macro PDF417 / QR Structured Append</option>
+      </select>
+    </div>
+
+    <div>
+      <label>Parity Frames</label>
+      <select id="fec">
+        <option value="0" selected>off</option>
+        <option value="0.05">5% — rebuild after a few misses</option>
+        <option value="0.1">10%</option>
+        <option value="0.2">20%</option>
+        <option value="0.33">33%</option>
+        <option value="0.5">50% — very lossy sessions</option>
+      </select>
+    </div>
+
+    <div>
+      <label>Compression</label>
+      <select id="compress">
+        <option value="none" selected>none — plain text frames</option>
+        <option value="auto">auto — zlib or lzma, whichever is smaller</option>
+        <option value="zlib">zlib</option>
+        <option value="lzma">lzma</option>
+      </select>
+    </div>
+
+    <div>
+      <label>Delivery</label>
+      <select id="delivery">
+        <option value="stream" selected>stream — encode all, show as they arrive</option>
+        <option value="lazy">lazy — render each frame on demand</option>
+      </select>
+    </div>
+
+    <div>
+      <label>PNG Profile</label>
+      <select id="png-profile">
+        <option value="fast" selected>fast — quick deflate</option>
+        <option value="small">small — max compression</option>
+      </select>
+    </div>
+
     <div>
       <label>Scale (px/module)</label>
       <div class="slider-row">
@@ -568,6 +694,12 @@ HTML = """<!DOCTYPE html>
         <img id="barcode-img" src="" alt="barcode">
       </div>
       <div class="seq-label" id="seq-label"></div>
+      <div class="barcode-nav">
+        <input type="text" class="resend-input" id="resend-frames" placeholder="missing frames, e.g. 5, 17, 30-35"
+               onkeydown="if (event.key === 'Enter') resendFrames()">
+        <button class="btn nav-prev" onclick="resendFrames()">Re-send</button>
+        <button class="btn nav-prev" id="resend-all" onclick="showFullSequence()" style="display:none">All frames</button>
+      </div>
     </div>
 
   </div>
@@ -576,43 +708,114 @@ HTML = """<!DOCTYPE html>
 <footer>
   <span id="footer-format">PDF417 // security level 2</span>
   <span id="footer-chunk">chunk size: 1180 chars</span>
-  <span>format: PNG base64</span>
+  <span id="footer-png">format: PNG 1-bit</span>
   <span>sparky // 192.168.1.218:8888</span>
 </footer>
 
 <script>
-  let barcodes = [];
+  let barcodes = [];   // {header, src} for each frame received so far
+  let expectedTotal = 0;
+  let jobId = null;
   let currentIdx = 0;
+  let fullSequence = null;  // {barcodes, expectedTotal} while showing a re-send
 
   // ── Live stats update ──
   const inputText  = document.getElementById('inputText');
   const charCountEl = document.getElementById('charCount');
   const chunkCountEl = document.getElementById('chunkCount');
+  const planSymbolEl = document.getElementById('planSymbol');
+  const planSizeEl   = document.getElementById('planSize');
 
   function getChunkSize() {
+    if (document.getElementById('chunk-auto').checked) return 'auto';
     return parseInt(document.getElementById('chunk-size').value) || 1180;
   }
 
   inputText.addEventListener('input', updateLiveStats);
   document.getElementById('chunk-size').addEventListener('input', updateLiveStats);
+  document.querySelectorAll('.panel-left select, .panel-left input').forEach(el =>
+    el.addEventListener('change', updateLiveStats));
+  window.addEventListener('resize', updateLiveStats);
+  document.getElementById('pdf417-security').addEventListener('change', e => {
+    document.getElementById('pdf417-floor').disabled = e.target.value !== 'auto';
+  });
+  document.getElementById('chunk-auto').addEventListener('change', e => {
+    document.getElementById('chunk-size').disabled = e.target.checked;
+    updateLiveStats();
+  });
 
+  // Exact counts come from /plan once editing pauses. Replanning after an
+  // early edit re-measures every later chunk, so the pause stretches to the
+  // last plan's time, one request runs at a time and only the newest answer
+  // is shown.
+  let planTimer = null;
+  let planSeq = 0;
+  let planBusy = false;
+  let planWait = 250;
   function updateLiveStats() {
-    const text = inputText.value;
-    const cs = getChunkSize();
-    charCountEl.textContent = text.length.toLocaleString();
-    chunkCountEl.textContent = text.length > 0 ? Math.ceil(text.length / cs) : 0;
+    charCountEl.textContent = inputText.value.length.toLocaleString();
+    clearTimeout(planTimer);
+    planSeq++;
+    if (!inputText.value.trim()) {
+      chunkCountEl.textContent = '0';
+      planSymbolEl.textContent = planSizeEl.textContent = '–';
+      return;
+    }
+    planTimer = setTimeout(refreshPlan, planWait);
+  }
+
+  async function refreshPlan() {
+    if (planBusy) return;  // the running plan reschedules when it lands
+    planBusy = true;
+    const seq = planSeq;
+    const started = performance.now();
+    let plan;
+    try {
+      const resp = await fetch('/plan', {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify(requestBody())
+      });
+      plan = await resp.json();
+    } catch (e) {
+      return;  // advisory only; Generate reports real errors
+    } finally {
+      planBusy = false;
+      planWait = Math.min(2000, Math.max(250, performance.now() - started));
+    }
+    if (seq !== planSeq) {
+      // Edited while planning: plan the newest text instead
+      clearTimeout(planTimer);
+      if (inputText.value.trim()) planTimer = setTimeout(refreshPlan, planWait);
+      return;
+    }
+    if (plan.error) {
+      chunkCountEl.textContent = '!';
+      chunkCountEl.title = plan.error;
+      planSymbolEl.textContent = planSizeEl.textContent = '–';
+      return;
+    }
+    chunkCountEl.textContent = plan.count.toLocaleString();
+    chunkCountEl.title = '';
+    planSymbolEl.textContent =
+      `${plan.symbol.rows}x${plan.symbol.columns} // ${plan.pixels.width}x${plan.pixels.height}px`;
+    planSizeEl.textContent = `~${(plan.response_bytes / 1024).toFixed(0)} KB`;
   }
 
   // ── Scale slider ──
   const scaleSlider = document.getElementById('scale');
   const scaleValEl = document.getElementById('scale-val');
-  scaleSlider.addEventListener('input', () => { scaleValEl.textContent = scaleSlider.value; });
+  scaleSlider.addEventListener('input', () => {
+    scaleValEl.textContent = scaleSlider.value;
+    updateLiveStats();
+  });
 
   // ── Format toggle ──
   document.querySelectorAll('input[name="format"]').forEach(r => {
     r.addEventListener('change', () => {
       const isQR = r.value === 'qr';
       document.getElementById('qr-options').style.display = isQR ? 'block' : 'none';
+      document.getElementById('pdf417-options').style.display = isQR ? 'none' : 'block';
       const chunkInput = document.getElementById('chunk-size');
       if (isQR && parseInt(chunkInput.value) > 800) chunkInput.value = 800;
       if (!isQR && parseInt(chunkInput.value) < 1180) chunkInput.value = 1180;
@@ -620,16 +823,43 @@ HTML = """<!DOCTYPE html>
     });
   });
 
+  // Room for one symbol: the right panel minus its padding, the barcode box
+  // padding and the nav / label rows around it.
+  function displayArea() {
+    const panel = document.getElementById('rightPanel');
+    return { width: panel.clientWidth - 56 - 64, height: window.innerHeight - 300 };
+  }
+
+  // Settings shared by /plan, /generate and /generate/stream
+  function requestBody() {
+    const format = document.querySelector('input[name="format"]:checked').value;
+    const sequence = document.getElementById('sequence').value;
+    return {
+      text: inputText.value.trim(),
+      format,
+      chunk_size: getChunkSize(),
+      scale: parseInt(scaleSlider.value),
+      qr_ecc: document.getElementById('qr-ecc').value,
+      qr_mask: document.getElementById('qr-mask').value,
+      columns: document.getElementById('pdf417-columns').value,
+      display: displayArea(),
+      security_level: document.getElementById('pdf417-security').value,
+      security_floor: parseInt(document.getElementById('pdf417-floor').value) || 0,
+      png_profile: document.getElementById('png-profile').value,
+      compress: document.getElementById('compress').value,
+      fec: parseFloat(document.getElementById('fec').value),
+      sequence: sequence === 'native' ? (format === 'qr' ? 'append' : 'macro') : sequence,
+    };
+  }
+
   // ── Generate ──
   async function generate() {
-    const text = inputText.value.trim();
-    if (!text) { showError('Please paste some text first.'); return; }
+    const body = requestBody();
+    if (!body.text) { showError('Please paste some text first.'); return; }
     hideError();
 
-    const format = document.querySelector('input[name="format"]:checked').value;
-    const chunkSize = getChunkSize();
-    const scale = parseInt(scaleSlider.value);
-    const qrEcc = document.getElementById('qr-ecc').value;
+    const { format, chunk_size: chunkSize, qr_ecc: qrEcc, png_profile: pngProfile } = body;
+    const delivery = document.getElementById('delivery').value;
 
     const btn = document.getElementById('encodeBtn');
     btn.disabled = true;
@@ -642,35 +872,89 @@ HTML = """<!DOCTYPE html>
     document.getElementById('progressBar').style.width = '0%';
     document.getElementById('progressLabel').textContent = 'Sending request...';
 
+    barcodes = [];
+    expectedTotal = 0;
+    jobId = null;
+    currentIdx = 0;
+    fullSequence = null;
+    document.getElementById('resend-all').style.display = 'none';
+    let pngBytes = 0;
+    let compression = null;
+    let qrInfo = null;
+    let geometry = null;
+    let resplit = 0;
+    let fecInfo = null;
+
     try {
-      const resp = await fetch('/generate', {
+      if (delivery === 'lazy') {
+        await startLazyJob({ ...body, mode: 'lazy' });
+        return;
+      }
+
+      const resp = await fetch('/generate/stream', {
         method: 'POST',
         headers: { 'Content-Type': 'application/json' },
-        body: JSON.stringify({ text, format, chunk_size: chunkSize, scale, qr_ecc: qrEcc })
+        body: JSON.stringify(body)
       });
-      const data = await resp.json();
-      if (data.error) { showError(data.error); progressWrap.style.display = 'none'; return; }
+      if (resp.headers.get('Content-Type').startsWith('application/json')) {
+        const data = await resp.json();
+        showError(data.error); progressWrap.style.display = 'none'; return;
+      }
+
+      // Read the SSE stream incrementally; events are separated by a blank line.
+      const reader = resp.body.getReader();
+      const decoder = new TextDecoder();
+      let buf = '';
+      let failed = false;
+      const handleEvent = (raw) => {
+        const event = raw.match(/^event: (.*)$/m)[1];
+        const data = JSON.parse(raw.match(/^data: (.*)$/m)[1]);
+        if (event === 'start') {
+          expectedTotal = data.count;
+          compression = data.compression;
+          qrInfo = data.qr;
+          geometry = data.pdf417;
+          resplit = data.resplit || 0;
+          fecInfo = data.fec;
+          document.getElementById('progressLabel').textContent = `Encoding 0 / ${expectedTotal}...`;
+        } else if (event === 'frame') {
+          barcodes.push({ header: data.header, src: 'data:image/png;base64,' + data.image });
+          pngBytes += data.bytes;
+          onFrameReceived();
+        } else if (event === 'error') {
+          failed = true;
+          showError(data.error);
+        } else if (event === 'done') {
+          jobId = data.job;
+        }
+      };
+      while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buf += decoder.decode(value, { stream: true });
+        let sep;
+        while ((sep = buf.indexOf('\\n\\n')) >= 0) {
+          handleEvent(buf.slice(0, sep));
+          buf = buf.slice(sep + 2);
+        }
+      }
+      if (failed && !barcodes.length) { progressWrap.style.display = 'none'; return; }
 
-      barcodes = data.barcodes;
-      currentIdx = 0;
-
-      document.getElementById('progressBar').style.width = '100%';
-      document.getElementById('progressLabel').textContent =
-        `Done — ${barcodes.length} barcode${barcodes.length !== 1 ? 's' : ''} generated`;
-
-      setTimeout(() => {
-        progressWrap.style.display = 'none';
-        const rs = document.getElementById('resultsSection');
-        rs.style.display = 'flex';
-        document.getElementById('totalBadge').textContent =
-          `${barcodes.length} barcode${barcodes.length !== 1 ? 's' : ''}`;
-        showBarcode(0);
-      }, 350);
+      progressWrap.style.display = 'none';
 
       // Update footer
       document.getElementById('footer-format').textContent =
-        format === 'qr' ? `QR Code // ECC ${qrEcc}` : 'PDF417 // security level 2';
-      document.getElementById('footer-chunk').textContent = `chunk size: ${chunkSize} chars`;
+        format === 'qr'
+          ? `QR Code // ECC ${qrEcc}` + (qrInfo ? ` // v${qrInfo.version} mask ${qrInfo.mask}` : '')
+          : `PDF417 // ${geometry.columns} cols x ${geometry.max_rows} rows max // ` + securityLabel(geometry.security);
+      document.getElementById('footer-chunk').textContent =
+        (chunkSize === 'auto' ? 'chunk size: auto (capacity)' : `chunk size: ${chunkSize} chars`) +
+        (resplit ? ` // ${resplit} re-split` : '') +
+        (fecInfo ? ` // +${fecInfo.parity_frames} parity` : '') +
+        (compression && compression.codec !== 'none'
+          ? ` // ${compression.codec} ${(compression.bytes_in / compression.bytes_out).toFixed(1)}x` : '');
+      document.getElementById('footer-png').textContent =
+        `PNG 1-bit ${pngProfile} // ${Math.round(pngBytes / Math.max(1, barcodes.length)).toLocaleString()} B/frame`;
 
     } catch (e) {
       showError('Request failed: ' + e.message);
@@ -680,13 +964,91 @@ HTML = """<!DOCTYPE html>
     }
   }
 
+  function securityLabel(sec) {
+    const levels = Object.keys(sec.frames_per_level);
+    if (sec.level !== 'auto') return `security level ${sec.level}`;
+    return `security auto L${levels[0]}-${levels[levels.length - 1]} // ${sec.ecc_saved_codewords} ECC cw saved`;
+  }
+
+  // Lazy mode: only headers come back; each <img> request renders its frame
+  // server-side while a prefetch thread stays a few frames ahead.
+  async function startLazyJob(body) {
+    const progressWrap = document.getElementById('progressWrap');
+    const resp = await fetch('/generate', {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify(body)
+    });
+    const data = await resp.json();
+    progressWrap.style.display = 'none';
+    if (data.error) { showError(data.error); return; }
+
+    jobId = data.job;
+    expectedTotal = data.count;
+    barcodes = data.headers.map((header, i) => ({ header, src: `/jobs/${jobId}/${i + 1}.png` }));
+    document.getElementById('totalBadge').textContent =
+      `${expectedTotal} barcode${expectedTotal !== 1 ? 's' : ''} (lazy)`;
+    document.getElementById('resultsSection').style.display = 'flex';
+    showBarcode(0);
+    document.getElementById('footer-png').textContent = `PNG 1-bit ${data.png_profile} // on demand`;
+  }
+
+  // Show only the frames the receiver reported missing, straight from the
+  // retained job; "All frames" goes back to the full sequence.
+  async function resendFrames() {
+    const frames = document.getElementById('resend-frames').value.trim();
+    if (!jobId || !frames) return;
+    hideError();
+    const resp = await fetch(`/jobs/${jobId}/resend`, {
+      method: 'POST',
+      headers: { 'Content-Type': 'application/json' },
+      body: JSON.stringify({ frames })
+    });
+    if (resp.status === 404) { showError('This job has expired; generate the sequence again.'); return; }
+    const data = await resp.json();
+    if (data.error) { showError(data.error); return; }
+
+    if (!fullSequence) fullSequence = { barcodes, expectedTotal };
+    barcodes = data.barcodes.map(b => ({ header: b.header, src: 'data:image/png;base64,' + b.image }));
+    expectedTotal = data.count;
+    currentIdx = 0;
+    document.getElementById('totalBadge').textContent = `${data.count} of ${data.total} barcodes (re-send)`;
+    document.getElementById('resend-all').style.display = '';
+    showBarcode(0);
+  }
+
+  function showFullSequence() {
+    if (!fullSequence) return;
+    ({ barcodes, expectedTotal } = fullSequence);
+    fullSequence = null;
+    currentIdx = 0;
+    document.getElementById('totalBadge').textContent =
+      `${expectedTotal} barcode${expectedTotal !== 1 ? 's' : ''}`;
+    document.getElementById('resend-all').style.display = 'none';
+    showBarcode(0);
+  }
+
+  // Frame 1 is shown as soon as it arrives; the rest fill in behind it.
+  function onFrameReceived() {
+    const n = barcodes.length;
+    document.getElementById('progressBar').style.width = `${Math.round(100 * n / expectedTotal)}%`;
+    document.getElementById('progressLabel').textContent = `Encoding ${n} / ${expectedTotal}...`;
+    document.getElementById('totalBadge').textContent =
+      n < expectedTotal ? `${n} / ${expectedTotal} barcodes` : `${n} barcode${n !== 1 ? 's' : ''}`;
+    if (n === 1) {
+      document.getElementById('resultsSection').style.display = 'flex';
+      showBarcode(0);
+    } else {
+      document.getElementById('total-count').textContent = expectedTotal;
+    }
+  }
+
   function showBarcode(idx) {
     if (!barcodes.length) return;
-    const b = barcodes[idx];
-    document.getElementById('barcode-img').src = 'data:image/png;base64,' + b.image;
-    document.getElementById('seq-label').textContent = b.header;
+    document.getElementById('barcode-img').src = barcodes[idx].src;
+    document.getElementById('seq-label').textContent = barcodes[idx].header;
     document.getElementById('cur-idx').textContent = idx + 1;
-    document.getElementById('total-count').textContent = barcodes.length;
+    document.getElementById('total-count').textContent = expectedTotal;
   }
 
   function prevBarcode() {
@@ -699,6 +1061,7 @@ HTML = """<!DOCTYPE html>
 
   // Keyboard navigation
   document.addEventListener('keydown', e => {
+    if (e.target.id === 'resend-frames') return;
     if (e.key === 'ArrowRight' || e.key === 'ArrowDown') nextBarcode();
     if (e.key === 'ArrowLeft'  || e.key === 'ArrowUp')   prevBarcode();
   });
@@ -706,10 +1069,12 @@ HTML = """<!DOCTYPE html>
   // ── Clear ──
   function clearAll() {
     inputText.value = '';
-    charCountEl.textContent  = '0';
-    chunkCountEl.textContent = '0';
+    updateLiveStats();
     barcodes = [];
+    expectedTotal = 0;
+    jobId = null;
     currentIdx = 0;
+    fullSequence = null;
     document.getElementById('resultsSection').style.display = 'none';
     document.getElementById('progressWrap').style.display   = 'none';
     document.getElementById('emptyState').style.display     = 'flex';
@@ -765,27 +1130,1310 @@ def chunk_text(text, chunk_size):
     return [text[i:i + chunk_size] for i in range(0, len(text), chunk_size)]
 
 
-def encode_pdf417(payload, scale):
-    codes = pdf417gen.encode(payload, security_level=2, columns=6)
-    img = pdf417gen.render_image(codes, scale=scale, ratio=3, padding=20)
+def chunk_to_capacity(text, header, fits, limit=None, guess=256):
+    """Split text into the longest chunks for which fits(header + chunk) holds.
+
+    ``fits`` is a FrameFit, so the search can aim instead of bisecting
+    blind: each chunk starts at ``guess`` (then the previous chunk's
+    length) and interpolates the measured sizes towards the capacity,
+    which usually settles in three or four measurements. Slicing is by
+    character, so a multi-byte UTF-8 sequence is never split. ``limit``
+    stops after that many chunks.
+    """
+    chunks = []
+    start = 0
+    base = fits.size(header)
+    while start < len(text) and (limit is None or len(chunks) < limit):
+        lo, hi = 0, len(text) - start + 1
+        lo_used, hi_used = base, None
+        n = min(guess, hi - 1)
+        probes = 0
+        while True:
+            used = fits.size(header + text[start:start + n])
+            probes += 1
+            if used <= fits.capacity:
+                lo, lo_used = n, used
+            else:
+                hi, hi_used = n, used
+            if hi - lo <= 1:
+                break
+            # Aim between the last size that fits and the first that would not
+            aim = fits.capacity + 0.5 - lo_used
+            if probes > 4:
+                n = (lo + hi) // 2 if hi_used else 2 * lo
+            elif hi_used:
+                n = lo + round(aim * (hi - lo) / (hi_used - lo_used))
+            else:
+                n = lo + round(aim * lo / max(1, lo_used - base))
+            n = min(max(n, lo + 1), hi - 1)
+
+        if lo == 0:
+            raise ValueError('Frame capacity is too small to hold the sequence header')
+        chunks.append(text[start:start + lo])
+        start += lo
+        guess = lo
+    return chunks
+
+
+def frame_header(n, total):
+    """[NNN/TOTAL], both padded to the total's width so headers sort past 999."""
+    width = max(3, len(str(total)))
+    return f'[{n:0{width}d}/{total:0{width}d}]'
+
+
+# Compact headers (sequence='compact') are all digits: frame kind, the
+# width W of the next two fields, the W-digit frame number and total, a
+# job id and the CRC-16 of the body. PDF417 numeric-compacts the run in
+# base 900 and QR packs it in numeric mode, so it costs about as much as a
+# text header while letting the receiver reject misreads and stray jobs.
+# Leading digits 5-9 are free for later header versions.
+COMPACT_DATA, COMPACT_PARITY = 1, 2
+COMPACT_JOB_IDS = 10000
+# Streamed frames (sequence='stream') have no total field: kind 3 says more
+# frames follow, kind 4 marks the last one, whose number is the total.
+COMPACT_MORE, COMPACT_FINAL = 3, 4
+
+
+def compact_header(n, total, job=0, body=b'', kind=COMPACT_DATA):
+    width = len(str(total))
+    crc = binascii.crc_hqx(as_bytes(body), 0)
+    return f'{kind}{width}{n:0{width}d}{total:0{width}d}{job:04d}{crc:05d}'
+
+
+def stream_header(n, job=0, body=b'', final=False):
+    width = len(str(n))
+    kind = COMPACT_FINAL if final else COMPACT_MORE
+    crc = binascii.crc_hqx(as_bytes(body), 0)
+    return f'{kind}{width}{n:0{width}d}{job:04d}{crc:05d}'
+
+
+def compact_job_id(document):
+    """Four-digit id for a document, so frames of another transfer are refused."""
+    return int.from_bytes(hashlib.sha256(as_bytes(document)).digest()[:4], 'big') % COMPACT_JOB_IDS
+
+
+def as_bytes(payload):
+    return payload if isinstance(payload, bytes) else payload.encode('utf-8')
+
+
+# Compressed documents start with COMPRESS_MAGIC and a one-byte codec tag;
+# receiver.decompress() undoes this on the isolated machine.
+COMPRESS_MAGIC = b'PZ'
+CODECS = {
+    'zlib': (b'z', lambda raw: zlib.compress(raw, 9)),
+    'lzma': (b'x', lambda raw: lzma.compress(raw, format=lzma.FORMAT_ALONE, preset=9)),
+}
+# Below this size lzma's header outweighs its better ratio, so 'auto' skips it
+LZMA_MIN_BYTES = 16 * 1024
+
+
+def compress_document(text, codec='auto'):
+    """Compress the whole normalized document ahead of chunking.
+
+    Returns (payload, codec). 'auto' keeps the smallest result; if nothing
+    beats the raw UTF-8 size the text is returned unchanged with codec 'none'.
+    """
+    raw = text.encode('utf-8')
+    if codec == 'auto':
+        names = ['zlib', 'lzma'] if len(raw) >= LZMA_MIN_BYTES else ['zlib']
+    elif codec in CODECS:
+        names = [codec]
+    else:
+        raise ValueError(f'Unknown compression codec: {codec}')
+
+    best, best_name = raw, 'none'
+    for name in names:
+        tag, compress = CODECS[name]
+        packed = COMPRESS_MAGIC + tag + compress(raw)
+        if len(packed) < len(best):
+            best, best_name = packed, name
+    if best_name == 'none':
+        return text, 'none'
+    return best, best_name
+
+
+def _widest_header(total, text, header=frame_header):
+    widest = header(total, total)
+    return widest.encode('ascii') if isinstance(text, bytes) else widest
+
+
+def chunk_for_frames(text, fits, header=frame_header):
+    """Capacity-aware chunking, re-run if the frame count widens the header."""
+    total = 1
+    while True:
+        chunks = chunk_to_capacity(text, _widest_header(total, text, header), fits)
+        if len(header(len(chunks), len(chunks))) <= len(header(total, total)):
+            return chunks
+        total = len(chunks)
+
+
+def heal_chunks(chunks, fits, header=frame_header):
+    """Split only the chunks that overflow a symbol; returns (chunks, resplit).
+
+    Chunks that fit are kept as they are, and each split starts from the
+    previous split's length. Numbered chunks are checked with the widest
+    ``header`` (None for unnumbered ones); splits only add frames, so the
+    pass starts over as soon as the count widens it.
+    """
+    total = len(chunks)
+    while True:
+        widest = _widest_header(total, chunks[0], header) if header else chunks[0][:0]
+        healed, resplit, split = [], 0, 256
+        for i, chunk in enumerate(chunks):
+            if fits(widest + chunk):
+                healed.append(chunk)
+                continue
+            pieces = chunk_to_capacity(chunk, widest, fits, guess=split)
+            split = len(pieces[0])
+            healed += pieces
+            resplit += 1
+            count = len(healed) + len(chunks) - i - 1
+            if header and len(header(count, count)) > len(header(total, total)):
+                total = count
+                break
+        else:
+            return healed, resplit
+
+
+# ─── Cross-frame parity ───
+# Systematic Cauchy Reed-Solomon over GF(256) across frames. Data frame i
+# joins group i % groups; each group of K data frames gets M parity rows,
+# and any K of its K + M rows rebuild it. Coefficient (j, i) is
+# 1 / ((K + j) xor i), which needs K + M <= 256 distinct field elements.
+# The code works bytewise, so a group's rows are laid end to end and cut
+# into frame-sized pieces; every byte column recovers from the rows whose
+# pieces arrived.
+FEC_MAX_GROUP = 255
+# Parity frame body after its text header: data frames, groups, group,
+# parity rows, row width, piece, pieces
+FEC_HEADER = struct.Struct('>HHHBHHH')
+# Each data chunk is prefixed with its byte length so padding can be stripped
+FEC_LENGTH = struct.Struct('>H')
+
+
+def _gf_tables():
+    """Exp/log tables for GF(256) with the 0x11d polynomial, plus a full product table."""
+    exp = np.zeros(512, dtype=np.uint8)
+    log = np.zeros(256, dtype=np.int64)
+    x = 1
+    for i in range(255):
+        exp[i] = exp[i + 255] = x
+        log[x] = i
+        x = (x << 1) ^ (0x11d if x & 0x80 else 0)
+    mul = exp[log[:, None] + log[None, :]]
+    mul[0, :] = mul[:, 0] = 0
+    return exp, log, mul
+
+
+GF_EXP, GF_LOG, GF_MUL = _gf_tables()
+
+
+def parity_header(n, total):
+    width = max(3, len(str(total)))
+    return f'[P{n:0{width}d}/{total:0{width}d}]'
+
+
+def fec_layout(count, ratio):
+    """(groups, parity rows per group) for ``count`` data frames."""
+    per_group = FEC_MAX_GROUP
+    while per_group + math.ceil(per_group * ratio) > FEC_MAX_GROUP:
+        per_group -= 1
+    groups = math.ceil(count / per_group)
+    sizes = [count // groups + (g < count % groups) for g in range(groups)]
+    return groups, [math.ceil(size * ratio) for size in sizes]
+
+
+def fec_parity(chunks, ratio, piece_size):
+    """Parity frame bodies (headers not included) for the data ``chunks``.
+
+    Each group's rows are cut into even pieces of at most ``piece_size`` bytes.
+    """
+    groups, parity_counts = fec_layout(len(chunks), ratio)
+    frames = []
+    for g, m in enumerate(parity_counts):
+        members = [as_bytes(chunk) for chunk in chunks[g::groups]]
+        width = FEC_LENGTH.size + max(map(len, members))
+        data = np.zeros((len(members), width), dtype=np.uint8)
+        for i, chunk in enumerate(members):
+            row = FEC_LENGTH.pack(len(chunk)) + chunk
+            data[i, :len(row)] = np.frombuffer(row, dtype=np.uint8)
+        k = len(members)
+        rows = []
+        for j in range(m):
+            coeffs = GF_EXP[255 - GF_LOG[(k + j) ^ np.arange(k)]]
+            rows.append(np.bitwise_xor.reduce(GF_MUL[coeffs[:, None], data], axis=0).tobytes())
+        rows = b''.join(rows)
+        pieces = math.ceil(len(rows) / piece_size)
+        size = math.ceil(len(rows) / pieces)
+        for p in range(pieces):
+            head = FEC_HEADER.pack(len(chunks), groups, g, m, width, p, pieces)
+            frames.append(head + rows[p * size:(p + 1) * size])
+    return frames
+
+
+def fec_piece_size(fits, header, count):
+    """Most parity bytes one frame holds behind a ``count``-frame ``header``."""
+    widest = header(count, count).encode('ascii')
+    payload = lambda size: widest + bytes(FEC_HEADER.size + size)
+    if not fits(payload(1)):
+        raise ValueError('Frame capacity is too small to hold a parity frame')
+    lo, hi = 1, 2
+    while fits(payload(hi)):
+        lo, hi = hi, hi * 2
+    while hi - lo > 1:
+        mid = (lo + hi) // 2
+        lo, hi = (mid, hi) if fits(payload(mid)) else (lo, mid)
+    return lo
+
+
+PDF417_COLUMNS = 6
+PDF417_MAX_COLUMNS = 30
+PDF417_SECURITY_LEVEL = 2
+# Recommended minimum security level by data codeword count (ISO/IEC 15438):
+# up to 40 -> 2, 160 -> 3, 320 -> 4, beyond that (863 is the most that fits) -> 5
+PDF417_RECOMMENDED_LEVELS = ((40, 2), (160, 3), (320, 4), (math.inf, 5))
+# Rendered row height in modules, and the quiet zone in pixels
+PDF417_ROW_HEIGHT = 3
+PDF417_PADDING = 20
+
+
+def pdf417_capacity(columns=PDF417_COLUMNS, security_level=PDF417_SECURITY_LEVEL,
+                    rows=pdf417gen.encoding.MAX_ROWS):
+    """Data codewords one symbol can hold after the length descriptor and ECC.
+
+    Bounded by the 928-codeword and 90-row limits (or a lower ``rows``);
+    padding only ever fills the last row, so rows * columns is the real
+    ceiling.
+    """
+    rows = min(rows, pdf417gen.encoding.MAX_ROWS, pdf417gen.encoding.MAX_CODE_WORDS // columns)
+    return rows * columns - 2 ** (security_level + 1) - 1
+
+
+def pdf417_auto_level(data_count, floor=0):
+    """Recommended security level for ``data_count`` codewords (descriptor included)."""
+    for limit, level in PDF417_RECOMMENDED_LEVELS:
+        if data_count <= limit:
+            return max(level, floor)
+
+
+def pdf417_frame_capacity(columns, security_level, rows, floor=0):
+    """pdf417_capacity, where 'auto' lets each frame take the level its size calls for.
+
+    Larger frames need more ECC, so the fullest frame is the best of each
+    recommendation band: as many codewords as the band allows, or as its
+    level's ECC leaves room for, whichever is smaller.
+    """
+    if security_level != 'auto':
+        return pdf417_capacity(columns, security_level, rows)
+    return max(min(limit - 1, pdf417_capacity(columns, max(level, floor), rows))
+               for limit, level in PDF417_RECOMMENDED_LEVELS)
+
+
+def pdf417_symbol_size(columns, rows, scale):
+    """Rendered (width, height) in pixels, quiet zone included."""
+    # Start pattern, left/right row indicators, data columns, stop pattern
+    modules = 17 * (columns + 3) + 18
+    return (modules * scale + 2 * PDF417_PADDING,
+            rows * PDF417_ROW_HEIGHT * scale + 2 * PDF417_PADDING)
+
+
+def pdf417_geometry(scale, columns=PDF417_COLUMNS, display=None,
+                    security_level=PDF417_SECURITY_LEVEL, floor=0):
+    """Columns and row ceiling that pack the most codewords into ``display``.
+
+    ``display`` is the (width, height) in pixels the symbol must fit at
+    ``scale`` px per module. 'auto' tries every column count and keeps the
+    largest capacity, preferring the smaller symbol on a tie; a fixed
+    column count is only checked against the display. ``security_level``
+    may be 'auto' (see pdf417_frame_capacity).
+    """
+    if columns == 'auto' and display is None:
+        raise ValueError('Automatic columns need the display size')
+    width, height = display or (math.inf, math.inf)
+    max_rows = min(pdf417gen.encoding.MAX_ROWS,
+                   (height - 2 * PDF417_PADDING) // (PDF417_ROW_HEIGHT * scale))
+
+    best, fitted = None, False
+    for cols in range(1, PDF417_MAX_COLUMNS + 1) if columns == 'auto' else [columns]:
+        rows = min(max_rows, pdf417gen.encoding.MAX_CODE_WORDS // cols)
+        size = pdf417_symbol_size(cols, rows, scale)
+        if size[0] > width or rows < pdf417gen.encoding.MIN_ROWS:
+            continue
+        fitted = True
+        capacity = pdf417_frame_capacity(cols, security_level, rows, floor)
+        if capacity > 0 and (best is None or (capacity, -size[0] * size[1]) >
+                             (best['capacity'], -best['width'] * best['height'])):
+            best = {'columns': cols, 'max_rows': int(rows), 'capacity': capacity,
+                    'width': size[0], 'height': size[1]}
+    if best is None and fitted:
+        where = 'any column count that fits' if columns == 'auto' else f'{columns} columns'
+        raise ValueError(f'Security level {security_level} leaves no data capacity at {where}')
+    if best is None:
+        what = 'PDF417' if columns == 'auto' else f'{columns}-column PDF417'
+        raise ValueError(f'A {width}x{height} px display is too small for {what} at scale {scale}')
+    return best
+
+
+# pdf417gen's compaction, counted instead of built. Bytes are classed as
+# digits (numeric compaction), text characters or anything else (byte
+# compaction); a text run latches to the first submode holding the next
+# character, in this order.
+PDF417_TEXT_SUBMODES = ('LOWER', 'UPPER', 'MIXED', 'PUNCT')
+
+
+def _compaction_tables():
+    classes = bytearray(b'b' * 256)
+    for char in CHARACTERS_LOOKUP:
+        classes[char] = ord('t')
+    for char in b'0123456789':
+        classes[char] = ord('n')
+    runs = {submode: re.compile(b'[' + b''.join(re.escape(bytes([char])) for char, modes
+                                                 in CHARACTERS_LOOKUP.items() if submode in modes) + b']*')
+            for submode in PDF417_TEXT_SUBMODES}
+    latch = {char: next(s for s in PDF417_TEXT_SUBMODES if s in modes)
+             for char, modes in CHARACTERS_LOOKUP.items()}
+    return bytes(classes), runs, latch
+
+
+PDF417_BYTE_CLASSES, PDF417_SUBMODE_RUNS, PDF417_SUBMODE_LATCH = _compaction_tables()
+PDF417_CLASS_RUN = re.compile(rb'n+|t+|b+')
+
+
+def _text_interim_count(data, start, end):
+    """Interim text values (two per codeword) for data[start:end], latches included."""
+    submode, count, pos = 'UPPER', end - start, start
+    while True:
+        pos = PDF417_SUBMODE_RUNS[submode].match(data, pos, end).end()
+        if pos == end:
+            return count
+        latched = PDF417_SUBMODE_LATCH[data[pos]]
+        count += len(SWITCH_CODES[submode][latched])
+        submode = latched
+        pos += 1
+
+
+def pdf417_compact_length(data):
+    """len(list(compact(data))), without building the codewords.
+
+    Follows pdf417gen's choices: digit runs under 13 next to text are
+    text-compacted, equal neighbours merge, and every run but a leading
+    text run starts with its latch.
+    """
+    runs = [[m.group()[:1], m.start(), m.end()]
+            for m in PDF417_CLASS_RUN.finditer(data.translate(PDF417_BYTE_CLASSES))]
+    kinds = [kind for kind, _, _ in runs]
+    for i, (kind, start, end) in enumerate(runs):
+        if kind == b'n' and end - start < 13 and b't' in kinds[max(0, i - 1):i] + kinds[i + 1:i + 2]:
+            runs[i][0] = b't'
+    count = 0
+    merged = []
+    for kind, start, end in runs:
+        if merged and merged[-1][0] == kind:
+            merged[-1][2] = end
+        else:
+            merged.append([kind, start, end])
+    for ordinal, (kind, start, end) in enumerate(merged):
+        if ordinal or kind != b't':
+            count += 1
+        if kind == b't':
+            count += (_text_interim_count(data, start, end) + 1) // 2
+        elif kind == b'n':
+            count += sum(len(to_base(int(b'1' + data[i:min(i + 44, end)]), 900))
+                         for i in range(start, end, 44))
+        else:
+            count += 5 * ((end - start) // 6) + (end - start) % 6
+    return count
+
+
+def pdf417_codeword_count(payload, binary=False):
+    """Exact number of data codewords pdf417gen's compaction produces for payload."""
+    if binary:
+        size = len(as_bytes(payload))
+        return 1 + 5 * (size // 6) + size % 6
+    return measured('pdf417', payload, lambda p: pdf417_compact_length(as_bytes(p)))
+
+
+def pdf417_byte_words(data):
+    """Byte compaction of the whole payload, so arbitrary bytes have a fixed size.
+
+    pdf417gen switches modes on every short printable run, which can cost
+    far more than byte mode on random data such as compressed chunks and
+    parity frames.
+    """
+    return [BYTE_LATCH_ALT if len(data) % 6 == 0 else BYTE_LATCH] + list(compact_bytes(data))
+
+
+def pdf417_fits(payload, columns=PDF417_COLUMNS, security_level=PDF417_SECURITY_LEVEL,
+                rows=pdf417gen.encoding.MAX_ROWS):
+    return pdf417_codeword_count(payload) <= pdf417_capacity(columns, security_level, rows)
+
+
+# Macro PDF417 control block codewords
+MACRO_BEGIN = 928
+MACRO_TERMINATOR = 922
+MACRO_MAX_SEGMENTS = 99999
+# Largest control block: begin + segment index(2) + file id(2) + terminator
+MACRO_OVERHEAD = 6
+
+
+def _numeric_codewords(digits):
+    """Numeric compaction of a digit string without the 902 latch."""
+    return to_base(int('1' + digits), 900)
+
+
+def macro_file_id(document):
+    """Two-codeword file ID derived from the document, so re-sends reassemble alike."""
+    value = int.from_bytes(hashlib.sha256(as_bytes(document)).digest()[:4], 'big') % (900 * 900)
+    return list(divmod(value, 900))
+
+
+def pdf417_data_count(payload, macro=None, binary=False):
+    """Data codewords before padding and ECC: descriptor, payload and macro block."""
+    control = len(macro_control_block(*macro)) if macro else 0
+    return 1 + pdf417_codeword_count(payload, binary) + control
+
+
+def macro_control_block(index, total, file_id):
+    """Macro PDF417 control block for 0-based segment ``index`` of ``total``.
+
+    Carries the segment index and file ID; the last segment also gets the
+    terminator, which is how readers know the set is complete. The optional
+    segment-count field is left out to save four codewords per frame.
+    """
+    words = [MACRO_BEGIN] + _numeric_codewords(f'{index:05d}') + list(file_id)
+    if index == total - 1:
+        words.append(MACRO_TERMINATOR)
+    return words
+
+
+def pdf417_data_words(payload, macro=None, columns=PDF417_COLUMNS,
+                      security_level=PDF417_SECURITY_LEVEL, binary=False):
+    """Length descriptor, data, padding and optional macro block, before ECC.
+
+    Mirrors pdf417gen.encode, with an optional ``macro`` (index, total,
+    file_id) control block placed after the pad codewords, as the spec
+    requires. ``binary`` payloads are byte-compacted throughout. Short
+    payloads are padded out to MIN_ROWS, which pdf417gen leaves to the
+    caller and wide symbols would otherwise miss.
+    """
+    if binary:
+        data_words = pdf417_byte_words(as_bytes(payload))
+    else:
+        data_words = list(compact(as_bytes(payload)))
+    control = macro_control_block(*macro) if macro else []
+
+    ec_count = 2 ** (security_level + 1)
+    padding = get_padding(len(data_words) + len(control), ec_count, columns)
+    short = (pdf417gen.encoding.MIN_ROWS * columns
+             - (1 + len(data_words) + len(padding) + len(control) + ec_count))
+    padding += [pdf417gen.encoding.PADDING_CODE_WORD] * max(0, short)
+    length_descriptor = len(data_words) + len(padding) + len(control) + 1
+    validate_barcode_size(length_descriptor, math.ceil((length_descriptor + ec_count) / columns))
+
+    return [length_descriptor] + data_words + padding + control
+
+
+# ─── PDF417 Reed-Solomon (GF(929)) ───
+# pdf417gen runs the generator polynomial as a shift register, one codeword
+# per Python loop iteration. The register is linear mod 929, so its final
+# state is the sum of each codeword times the register's response to a lone
+# 1 followed by zeros. Those responses are tabulated once per level, and a
+# batch of symbols becomes a single matrix product.
+RS_RESPONSES = {}
+
+
+def rs_responses(security_level):
+    """Row k: register state after feeding 1 then k zeros (float64, for BLAS)."""
+    rows = RS_RESPONSES.get(security_level)
+    if rows is None:
+        factors = np.array(ERROR_CORRECTION_FACTORS[security_level], dtype=np.int64)
+        rows = np.empty((pdf417gen.encoding.MAX_CODE_WORDS, len(factors)), dtype=np.int64)
+        state = -factors % 929
+        for k in range(pdf417gen.encoding.MAX_CODE_WORDS):
+            rows[k] = state
+            state = (np.concatenate(([0], state[:-1])) - state[-1] * factors) % 929
+        rows = RS_RESPONSES[security_level] = rows.astype(np.float64)
+    return rows
+
+
+def pdf417_ecc_batch(word_lists, security_level):
+    """Error correction codewords for many symbols at once.
+
+    Bit-identical to pdf417gen's compute_error_correction_code_words. Sums
+    stay below 928**3 < 2**53, so the float64 product is exact.
+    """
+    if not word_lists:
+        return []
+    rows = rs_responses(security_level)
+    longest = max(map(len, word_lists))
+    messages = np.zeros((len(word_lists), longest))
+    for i, words in enumerate(word_lists):
+        # Last codeword pairs with row 0, first with row len-1
+        messages[i, :len(words)] = words[::-1]
+    state = np.fmod(messages @ rows[:longest], 929).astype(np.int64)
+    return (-state[:, ::-1] % 929).tolist()
+
+
+def pdf417_rows_batch(word_lists, columns=PDF417_COLUMNS, security_level=PDF417_SECURITY_LEVEL):
+    """Append ECC to each word list and lay it out as a codeword matrix."""
+    eccs = pdf417_ecc_batch(word_lists, security_level)
+    return [list(encode_rows(list(split_every(words + ecc, columns)), columns, security_level))
+            for words, ecc in zip(word_lists, eccs)]
+
+
+def pdf417_codes(payload, macro=None, columns=PDF417_COLUMNS,
+                 security_level=PDF417_SECURITY_LEVEL, binary=False):
+    """High-level encode + Reed-Solomon: the scale-independent codeword matrix."""
+    words = pdf417_data_words(payload, macro, columns, security_level, binary)
+    return pdf417_rows_batch([words], columns, security_level)[0]
+
+
+def pdf417_shape(opts):
+    """(columns, security_level) a PDF417 job is encoded with."""
+    return opts.get('columns', PDF417_COLUMNS), opts.get('security_level', PDF417_SECURITY_LEVEL)
+
+
+def _pattern_bits(code, width):
+    return np.array([int(b) for b in format(code, f'0{width}b')], dtype=bool)
+
+
+# Bar patterns are 17 modules wide except the 18-module stop pattern.
+PDF417_START_BITS = _pattern_bits(pdf417gen.encoding.START_CHARACTER, 17)
+PDF417_STOP_BITS = _pattern_bits(pdf417gen.encoding.STOP_CHARACTER, 18)
+
+
+def pdf417_modules(codes):
+    """Expand a low-level codeword matrix into a rows x modules bool array (True = bar).
+
+    Every codeword is unpacked through numpy's byte-to-bit table in one
+    pass; the constant start/stop columns are pasted from precomputed rows.
+    """
+    words = np.asarray(codes, dtype='>u4')[:, 1:-1]
+    rows, cols = words.shape
+    bits = np.unpackbits(words.view(np.uint8).reshape(rows, cols, 4), axis=2)[:, :, -17:]
+    return np.hstack([
+        np.broadcast_to(PDF417_START_BITS, (rows, 17)),
+        bits.reshape(rows, cols * 17),
+        np.broadcast_to(PDF417_STOP_BITS, (rows, 18)),
+    ])
+
+
+def render_pdf417_image(codes, scale, ratio=PDF417_ROW_HEIGHT, padding=PDF417_PADDING):
+    """Pixel-identical replacement for pdf417gen.render_image (as mode 'L')."""
+    pixels = np.where(pdf417_modules(codes), np.uint8(0), np.uint8(255))
+    pixels = pixels.repeat(scale * ratio, axis=0).repeat(scale, axis=1)
+    pixels = np.pad(pixels, padding, constant_values=255)
+    height, width = pixels.shape
+    return Image.frombuffer('L', (width, height), pixels, 'raw', 'L', 0, 1)
+
+
+def render_pdf417(codes, scale, profile='fast'):
+    return png_bytes(render_pdf417_image(codes, scale), profile)
+
+
+def encode_pdf417(payload, scale, profile='fast', columns=PDF417_COLUMNS):
+    return render_pdf417(pdf417_codes(payload, columns=columns), scale, profile)
+
+
+# Every frame is pure black/white, so PNGs are always written 1 bit per pixel.
+# 'fast' trades a few percent of size for a much cheaper deflate.
+PNG_PROFILES = {
+    'fast':  {'compress_level': 1, 'optimize': False},
+    'small': {'compress_level': 9, 'optimize': True},
+}
+
+
+def png_bytes(img, profile='fast'):
+    """Save a black/white image as a 1-bit PNG using a PNG_PROFILES entry."""
+    if img.mode != '1':
+        img = img.convert('1', dither=Image.Dither.NONE)
     buf = io.BytesIO()
-    img.save(buf, format='PNG')
-    return base64.b64encode(buf.getvalue()).decode()
+    img.save(buf, format='PNG', **PNG_PROFILES.get(profile, PNG_PROFILES['fast']))
+    return buf.getvalue()
+
+
+def render_qr_image(modules, box_size, border=4):
+    """1-bit image straight from the module matrix; same pixels as qr.make_image()."""
+    dark = np.pad(np.array(modules, dtype=bool), border)
+    light = ~dark.repeat(box_size, axis=0).repeat(box_size, axis=1)
+    return Image.fromarray(light)
+
+
+def qr_payload_bits(payload):
+    """Data bits of payload in a version 40 symbol with optimal segmentation."""
+    return measured('qr40', payload, lambda p: qr_bits(qr_segments(p, 40), 40))
+
+
+# Structured Append: mode indicator, symbol position, total - 1, parity byte
+QR_MODE_STRUCTURED_APPEND = 0b0011
+QR_APPEND_BITS = 4 + 4 + 4 + 8
+QR_APPEND_MAX_SYMBOLS = 16
+
+
+def qr_append_parity(document):
+    """Structured Append parity: XOR of every byte of the whole message."""
+    parity = 0
+    for byte in as_bytes(document):
+        parity ^= byte
+    return parity
+
+
+QR_MODES = (qrcode.util.MODE_NUMBER, qrcode.util.MODE_ALPHA_NUM, qrcode.util.MODE_8BIT_BYTE)
+# Cost of one character in sixths of a bit, so 10 bits / 3 digits and
+# 11 bits / 2 alphanumerics stay integral
+QR_CHAR_COST = (20, 33, 48)
+QR_CHARSETS = (frozenset(b'0123456789'), frozenset(qrcode.util.ALPHA_NUM), None)
+# Versions sharing the same character-count field widths
+QR_VERSION_CLASSES = ((1, 9), (10, 26), (27, 40))
+
+
+def qr_segments(payload, version=40):
+    """Optimal numeric/alphanumeric/byte segmentation for the given version.
+
+    Dynamic programming over mode switches: for each character, the cheapest
+    way to be in each mode after it, where a switch pays the 4-bit mode
+    indicator plus the version's character-count field.
+    """
+    data = as_bytes(payload)
+    if not data:
+        return [qrcode.util.QRData(data, qrcode.util.MODE_8BIT_BYTE)]
+    modes = range(len(QR_MODES))
+    head = [(4 + qrcode.util.length_in_bits(mode, version)) * 6 for mode in QR_MODES]
+    inf = float('inf')
+
+    costs = head[:]
+    char_modes = []
+    for byte in data:
+        cur = [inf, inf, inf]
+        used = [None, None, None]
+        for m in modes:
+            if QR_CHARSETS[m] is None or byte in QR_CHARSETS[m]:
+                cur[m] = costs[m] + QR_CHAR_COST[m]
+                used[m] = m
+        # Switching after this character rounds the finished segment up to whole bits
+        for to in modes:
+            for frm in modes:
+                if used[frm] is not None:
+                    switched = -(-cur[frm] // 6) * 6 + head[to]
+                    if switched < cur[to]:
+                        cur[to] = switched
+                        used[to] = used[frm]
+        char_modes.append(used)
+        costs = cur
+
+    mode = min(modes, key=lambda m: costs[m])
+    per_char = []
+    for used in reversed(char_modes):
+        mode = used[mode]
+        per_char.append(mode)
+    per_char.reverse()
+
+    segments = []
+    start = 0
+    for i in range(1, len(data) + 1):
+        if i == len(data) or per_char[i] != per_char[start]:
+            segments.append(qrcode.util.QRData(data[start:i], QR_MODES[per_char[start]]))
+            start = i
+    return segments
+
+
+def qr_bits(data_list, version):
+    """Bits the segments occupy in a symbol of ``version``, headers included."""
+    bits = 0
+    for data in data_list:
+        n = len(data)
+        if data.mode == qrcode.util.MODE_NUMBER:
+            payload = 10 * (n // 3) + (0, 4, 7)[n % 3]
+        elif data.mode == qrcode.util.MODE_ALPHA_NUM:
+            payload = 11 * (n // 2) + 6 * (n % 2)
+        else:
+            payload = 8 * n
+        bits += 4 + qrcode.util.length_in_bits(data.mode, version) + payload
+    return bits
+
+
+def qr_plan(payload, ecc, extra_bits=0):
+    """(version, segments) for the smallest version that holds payload.
+
+    Segmentation depends on the count-field widths, so each version class
+    is optimized separately.
+    """
+    for first, last in QR_VERSION_CLASSES:
+        segments = qr_segments(payload, last)
+        bits = extra_bits + qr_bits(segments, last)
+        for version in range(first, last + 1):
+            if bits <= qrcode.util.BIT_LIMIT_TABLE[ecc][version]:
+                return version, segments
+    raise qrcode.exceptions.DataOverflowError()
+
+
+def qr_data_codewords(data_list, version, ecc, append=None):
+    """qrcode.util.create_data, optionally prefixed with a Structured Append header.
+
+    ``append`` is (position, total, parity) with a 0-based position.
+    """
+    util = qrcode.util
+    buffer = util.BitBuffer()
+    if append:
+        position, total, parity = append
+        buffer.put(QR_MODE_STRUCTURED_APPEND, 4)
+        buffer.put(position, 4)
+        buffer.put(total - 1, 4)
+        buffer.put(parity, 8)
+    for data in data_list:
+        buffer.put(data.mode, 4)
+        buffer.put(len(data), util.length_in_bits(data.mode, version))
+        data.write(buffer)
+
+    rs_blocks = qrcode.base.rs_blocks(version, ecc)
+    bit_limit = sum(block.data_count * 8 for block in rs_blocks)
+    if len(buffer) > bit_limit:
+        raise qrcode.exceptions.DataOverflowError(
+            f'Code length overflow. Data size ({len(buffer)}) > size available ({bit_limit})')
+
+    # Terminator, byte alignment, then alternating pad bytes
+    for _ in range(min(bit_limit - len(buffer), 4)):
+        buffer.put_bit(False)
+    if len(buffer) % 8:
+        for _ in range(8 - len(buffer) % 8):
+            buffer.put_bit(False)
+    for i in range((bit_limit - len(buffer)) // 8):
+        buffer.put(util.PAD0 if i % 2 == 0 else util.PAD1, 8)
+
+    return util.create_bytes(buffer, rs_blocks)
+
+
+def qr_payload_version(payload, ecc_level, append=None):
+    ecc = ECC_MAP.get(ecc_level, qrcode.constants.ERROR_CORRECT_M)
+    extra_bits = QR_APPEND_BITS if append else 0
+    return measured(('qr-version', ecc, extra_bits), payload,
+                    lambda p: qr_plan(p, ecc, extra_bits)[0])
 
 
-def encode_qr(payload, scale, ecc_level):
+def build_qr(payload, scale, ecc_level, append=None, version=None, mask=None):
+    """A compiled QRCode. With ``version``/``mask`` pinned, skip best_fit and the 8-mask search."""
     ecc = ECC_MAP.get(ecc_level, qrcode.constants.ERROR_CORRECT_M)
+    if version is None:
+        version, data_list = qr_plan(payload, ecc, QR_APPEND_BITS if append else 0)
+    else:
+        data_list = qr_segments(payload, version)
     qr = qrcode.QRCode(
+        version=version,
         error_correction=ecc,
         box_size=scale,
         border=4,
+        mask_pattern=mask,
     )
-    qr.add_data(payload.encode('utf-8'))
-    qr.make(fit=True)
-    img = qr.make_image(fill_color='black', back_color='white').convert('RGB')
-    buf = io.BytesIO()
-    img.save(buf, format='PNG')
-    return base64.b64encode(buf.getvalue()).decode()
+    qr.data_cache = qr_data_codewords(data_list, version, ecc, append)
+    qr.make(fit=False)
+    return qr
+
+
+def encode_qr(payload, scale, ecc_level, profile='fast', append=None, version=None, mask=None):
+    qr = build_qr(payload, scale, ecc_level, append, version, mask)
+    img = render_qr_image(qr.modules, qr.box_size, qr.border)
+    return png_bytes(img, profile)
+
+
+# Best mask found per (version, ecc level), reused by later pinned jobs
+QR_MASKS = {}
+
+
+def qr_pin_settings(jobs, ecc_level, mask='pin'):
+    """Version and mask shared by every frame of a QR job.
+
+    The version is the largest any frame needs. The mask is either fixed
+    (0-7) or, for 'pin', the penalty-scored best mask of the first frame at
+    that version, cached for later jobs of the same size.
+    """
+    version = max(qr_payload_version(payload, ecc_level, opts.get('append'))
+                  for _, payload, opts in jobs)
+    if mask == 'pin':
+        key = (version, ecc_level)
+        if key not in QR_MASKS:
+            _, payload, opts = jobs[0]
+            qr = build_qr(payload, 1, ecc_level, opts.get('append'), version)
+            QR_MASKS[key] = qr.best_mask_pattern()
+        mask = QR_MASKS[key]
+    else:
+        mask = int(mask)
+        if not 0 <= mask <= 7:
+            raise ValueError(f'QR mask must be 0-7, got {mask}')
+    return version, mask
+
+
+def encode_chunk(job, codes=None):
+    """Encode one (format, payload, opts) job to PNG bytes. Runs in pool workers.
+
+    Returns (png, codes). For PDF417, pass previously computed ``codes`` to
+    skip straight to rendering; codes comes back only when computed here.
+    """
+    fmt, payload, opts = job
+    profile = opts['png_profile']
+    if fmt == 'qr':
+        png = encode_qr(payload, opts['scale'], opts['qr_ecc'], profile,
+                        opts.get('append'), opts.get('qr_version'), opts.get('qr_mask'))
+        return png, None
+    if codes is not None:
+        return render_pdf417(codes, opts['scale'], profile), None
+    codes = pdf417_codes(payload, opts.get('macro'), *pdf417_shape(opts), opts.get('binary', False))
+    return render_pdf417(codes, opts['scale'], profile), codes
+
+
+def encode_batch(work):
+    """Encode a list of (job, codes) pairs in one worker call.
+
+    PDF417 codewords missing from the batch are computed first so their
+    Reed-Solomon step runs as one matrix product per symbol shape. Returns (png, codes) per
+    job in order; if a job fails, the results before it are followed by the
+    exception so the caller can report the right chunk.
+    """
+    shapes, error = {}, None
+    for i, ((fmt, payload, opts), codes) in enumerate(work):
+        if fmt != 'qr' and codes is None:
+            shape = pdf417_shape(opts)
+            try:
+                words = pdf417_data_words(payload, opts.get('macro'), *shape, opts.get('binary', False))
+            except Exception as e:
+                work, error = work[:i], e
+                break
+            shapes.setdefault(shape, {})[i] = words
+    fresh = {}
+    for shape, words in shapes.items():
+        fresh.update(zip(words, pdf417_rows_batch(list(words.values()), *shape)))
+
+    results = []
+    for i, (job, codes) in enumerate(work):
+        try:
+            if i in fresh:
+                opts = job[2]
+                results.append((render_pdf417(fresh[i], opts['scale'], opts['png_profile']), fresh[i]))
+            else:
+                results.append(encode_chunk(job, codes))
+        except Exception as e:
+            return results + [e]
+    if error is not None:
+        results.append(error)
+    return results
+
+
+# ─── Execution engines ───
+
+def _cgroup_cpu_quota():
+    """CPU limit from the container's cgroup (v2 cpu.max, then v1 CFS), or None."""
+    try:
+        with open('/sys/fs/cgroup/cpu.max') as f:
+            quota, period = f.read().split()
+        return None if quota == 'max' else math.ceil(int(quota) / int(period))
+    except (OSError, ValueError):
+        pass
+    try:
+        with open('/sys/fs/cgroup/cpu/cpu.cfs_quota_us') as f:
+            quota = int(f.read())
+        with open('/sys/fs/cgroup/cpu/cpu.cfs_period_us') as f:
+            period = int(f.read())
+        return math.ceil(quota / period) if quota > 0 else None
+    except (OSError, ValueError):
+        return None
+
+
+def available_cpus():
+    """Cores this process may actually use: affinity mask capped by cgroup quota."""
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus = os.cpu_count() or 1
+    quota = _cgroup_cpu_quota()
+    if quota:
+        cpus = min(cpus, quota)
+    return max(1, cpus)
+
+
+class SerialEngine:
+    """Encodes jobs one after another in the request thread."""
+    name = 'serial'
+
+    def __init__(self, workers=1):
+        self.workers = 1
+
+    def map(self, fn, jobs, chunksize=None):
+        return map(fn, jobs)
+
+
+class ProcessPoolEngine:
+    """Fans jobs out over a lazily started process pool.
+
+    Results are yielded in job order, so an exception surfaces at the first
+    failing job exactly as it would in the serial loop. A pool whose worker
+    died (OOM kill, crash) is replaced and the unfinished jobs go to the new
+    one; they give up once an attempt breaks before finishing any job.
+    """
+    name = 'process'
+
+    def __init__(self, workers):
+        self.workers = workers
+        self._pool = None
+        self._lock = threading.Lock()
+
+    def _get_pool(self):
+        with self._lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(max_workers=self.workers)
+            return self._pool
+
+    def _discard(self, pool):
+        with self._lock:
+            if self._pool is pool:
+                self._pool = None
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    def _results(self, pool, fn, jobs, chunksize, retry=True):
+        done = 0
+        try:
+            for result in pool.map(fn, jobs, chunksize=chunksize):
+                yield result
+                done += 1
+        except BrokenProcessPool:
+            self._discard(pool)
+            if not (retry or done):
+                raise
+            yield from self._results(self._get_pool(), fn, jobs[done:], chunksize, retry=False)
+
+    def map(self, fn, jobs, chunksize=None):
+        """Like Executor.map; pass chunksize=1 when the first result is wanted ASAP."""
+        jobs = list(jobs)
+        if len(jobs) < 2:
+            return map(fn, jobs)
+        try:
+            pool = self._get_pool()
+        except OSError:
+            # No usable semaphores / shared memory in this container.
+            return map(fn, jobs)
+        if chunksize is None:
+            chunksize = max(1, len(jobs) // (self.workers * 4))
+        return self._results(pool, fn, jobs, chunksize)
+
+
+ENGINES = {
+    'serial': SerialEngine,
+    'process': ProcessPoolEngine,
+}
+
+
+def make_engine(name=None, workers=None):
+    """Build the engine named by ENCODE_ENGINE, sized by ENCODE_WORKERS or cgroup."""
+    name = name or os.environ.get('ENCODE_ENGINE', 'process')
+    workers = workers or int(os.environ.get('ENCODE_WORKERS', 0)) or available_cpus()
+    if workers < 2:
+        name = 'serial'
+    return ENGINES.get(name, SerialEngine)(workers)
+
+
+ENGINE = make_engine()
+
+
+# ─── Image cache ───
+
+class LRUCache:
+    """Thread-safe LRU mapping bounded by the total byte size of its values."""
+
+    def __init__(self, max_bytes, sizeof=len):
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, value):
+        size = self.sizeof(value)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.bytes -= old[1]
+            self._entries[key] = (value, size)
+            self.bytes += size
+            while self.bytes > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self.bytes -= evicted
+                self.evictions += 1
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'bytes': self.bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+            }
+
+
+IMAGE_CACHE = LRUCache(int(os.environ.get('IMAGE_CACHE_MB', 256)) * 1024 * 1024)
+
+# Second level: PDF417 codeword matrices, independent of scale, so a
+# re-render at a new scale skips compaction and Reed-Solomon.
+CODES_CACHE = LRUCache(
+    int(os.environ.get('CODES_CACHE_MB', 64)) * 1024 * 1024,
+    sizeof=lambda codes: 32 * sum(len(row) for row in codes),
+)
+
+
+# Encoded sizes by payload digest. Capacity chunking measures the same
+# prefixes again whenever /plan or /generate sees a lightly edited document.
+MEASURE_CACHE = LRUCache(
+    int(os.environ.get('MEASURE_CACHE_MB', 8)) * 1024 * 1024,
+    sizeof=lambda size: 100,  # digest key plus entry overhead, roughly
+)
+
+
+def measured(kind, payload, measure):
+    """measure(payload), memoized in MEASURE_CACHE under ``kind``."""
+    key = (kind, hashlib.sha1(as_bytes(payload)).digest())
+    size = MEASURE_CACHE.get(key)
+    if size is None:
+        size = measure(payload)
+        MEASURE_CACHE.put(key, size)
+    return size
+
+
+def job_key(job):
+    """Content hash of everything that affects a job's rendered image."""
+    fmt, payload, opts = job
+    params = (fmt, sorted(opts.items()))
+    if fmt != 'qr':
+        params += pdf417_shape(opts)
+    h = hashlib.sha256(repr(params).encode())
+    h.update(as_bytes(payload))
+    return h.hexdigest()
+
+
+def codes_key(job):
+    _, payload, opts = job
+    params = pdf417_shape(opts) + (opts.get('macro'), opts.get('binary', False))
+    h = hashlib.sha256(repr(params).encode())
+    h.update(as_bytes(payload))
+    return h.hexdigest()
+
+
+def encode_frames(jobs, chunksize=None, cache=True):
+    """Yield each job's image in order, encoding only the cache misses.
+
+    With ``cache`` off nothing new is stored, for frames that won't be asked for again.
+    """
+    keys = [job_key(job) for job in jobs]
+    cached = [IMAGE_CACHE.get(key) for key in keys]
+
+    work = []
+    for job, img in zip(jobs, cached):
+        if img is None:
+            codes = CODES_CACHE.get(codes_key(job)) if job[0] != 'qr' else None
+            work.append((job, codes))
+    # Each batch is one worker call; chunksize=1 keeps the first frame fast
+    size = chunksize or max(1, math.ceil(len(work) / (ENGINE.workers * 4)))
+    batches = [work[i:i + size] for i in range(0, len(work), size)]
+    misses = (result for results in ENGINE.map(encode_batch, batches, chunksize=1)
+              for result in results)
+
+    for job, key, img in zip(jobs, keys, cached):
+        if img is None:
+            result = next(misses)
+            if isinstance(result, Exception):
+                raise result
+            img, codes = result
+            if cache:
+                IMAGE_CACHE.put(key, img)
+                if codes is not None:
+                    CODES_CACHE.put(codes_key(job), codes)
+        yield img
+
+
+# ─── Server-side jobs ───
+
+class Job:
+    """A generated sequence kept server-side so frames can be fetched as PNGs."""
+
+    def __init__(self, headers, frames, meta):
+        self.id = uuid.uuid4().hex[:12]
+        self.headers = headers
+        self.frames = frames
+        self.meta = meta
+
+    @property
+    def nbytes(self):
+        return sum(len(png) for png in self.frames)
+
+    def frame(self, n):
+        """PNG bytes of frame n (1-based)."""
+        return self.frames[n - 1]
+
+    def frames_at(self, numbers):
+        """PNG bytes of several frames at once (1-based positions)."""
+        return [self.frames[n - 1] for n in numbers]
+
+    def manifest(self):
+        return {
+            'job': self.id,
+            'count': len(self.headers),
+            'headers': self.headers,
+            'png_bytes': self.nbytes,
+            **self.meta,
+        }
+
+
+class PayloadJob(Job):
+    """A job that keeps only its chunk payloads.
+
+    Kept for inline /generate responses, whose PNGs already went to the
+    client; frames asked for again come from IMAGE_CACHE or are re-encoded.
+    """
+
+    def __init__(self, headers, jobs, meta):
+        super().__init__(headers, [], meta)
+        self.jobs = jobs
+
+    @property
+    def nbytes(self):
+        return sum(len(job[1]) for job in self.jobs)
+
+    def frame(self, n):
+        return next(encode_frames([self.jobs[n - 1]]))
+
+    def frames_at(self, numbers):
+        return list(encode_frames([self.jobs[n - 1] for n in numbers]))
+
+    def manifest(self):
+        manifest = super().manifest()
+        manifest['png_bytes'] = None
+        return manifest
+
+
+class LazyJob(PayloadJob):
+    """A job whose frames are rendered on first request.
+
+    Only the chunked payloads are held up front. A prefetch thread keeps the
+    ``lookahead`` frames after the most recently requested one rendered, and
+    frames that fall out of that window are dropped again, so memory tracks the
+    lookahead rather than the document size. Frames bypass IMAGE_CACHE for
+    the same reason.
+    """
+
+    IDLE_TIMEOUT = 60
+
+    def __init__(self, headers, jobs, meta, lookahead=8):
+        super().__init__(headers, jobs, meta)
+        self.lookahead = lookahead
+        self._window = {}
+        self._cursor = 1
+        self._inflight = set()
+        self._cond = threading.Condition()
+        self._worker = None
+
+    def frame(self, n):
+        with self._cond:
+            self._cursor = n
+            for old in [k for k in self._window if not n - self.lookahead <= k <= n + self.lookahead]:
+                del self._window[old]
+            self._ensure_worker()
+            self._cond.notify_all()
+            # Already being rendered by the prefetch thread: wait for it
+            while n in self._inflight:
+                self._cond.wait()
+            png = self._window.get(n)
+        if png is None:
+            png = next(encode_frames([self.jobs[n - 1]], cache=False))
+            with self._cond:
+                self._window[n] = png
+        return png
+
+    def manifest(self):
+        manifest = super().manifest()
+        manifest.update({'lazy': True, 'lookahead': self.lookahead})
+        return manifest
+
+    def _ensure_worker(self):
+        if self._worker is None or not self._worker.is_alive():
+            self._worker = threading.Thread(target=self._prefetch, daemon=True)
+            self._worker.start()
+
+    def _pending(self):
+        last = min(self._cursor + self.lookahead, len(self.jobs))
+        # The cursor frame itself is rendered by frame()
+        return [n for n in range(self._cursor + 1, last + 1) if n not in self._window]
+
+    def _prefetch(self):
+        while True:
+            with self._cond:
+                pending = self._pending()
+                if not pending:
+                    self._cond.wait(self.IDLE_TIMEOUT)
+                    pending = self._pending()
+                    if not pending:
+                        return
+                self._inflight = set(pending)
+            try:
+                jobs = [self.jobs[n - 1] for n in pending]
+                for n, png in zip(pending, encode_frames(jobs, cache=False)):
+                    with self._cond:
+                        if self._cursor <= n <= self._cursor + self.lookahead:
+                            self._window[n] = png
+                        self._inflight.discard(n)
+                        self._cond.notify_all()
+            except Exception:
+                # Surfaced with the chunk number when the frame is requested.
+                return
+            finally:
+                with self._cond:
+                    self._inflight.clear()
+                    self._cond.notify_all()
+
+
+JOBS = LRUCache(
+    int(os.environ.get('JOB_STORE_MB', 512)) * 1024 * 1024,
+    sizeof=lambda job: job.nbytes,
+)
+
+
+def parse_frame_ranges(expr, count, parity=0):
+    """'5, 17, 30-35' -> 1-based job positions, in order, without repeats.
+
+    Numbers are the ones printed in the frame headers, so data frame n is
+    position n and parity frame Pn (``P2``, ``P1-P3``) follows the data.
+    """
+    data = count - parity
+    positions = []
+    for part in re.split(r'[\s,]+', re.sub(r'\s*-\s*', '-', expr.strip())):
+        if not part:
+            continue
+        m = re.fullmatch(r'(P?)(\d+)(?:-P?(\d+))?', part, re.IGNORECASE)
+        if m is None:
+            raise ValueError(f'Cannot read frame range "{part}"; use e.g. 5, 17, 30-35, P2')
+        first, last = int(m.group(2)), int(m.group(3) or m.group(2))
+        limit, offset = (parity, data) if m.group(1) else (data, 0)
+        if m.group(1) and not parity:
+            raise ValueError('This sequence has no parity frames')
+        if not 1 <= first <= last <= limit:
+            kind = 'parity frames P1-P' if m.group(1) else 'frames 1-'
+            raise ValueError(f'"{part}" is outside {kind}{limit}')
+        positions.extend(range(offset + first, offset + last + 1))
+    if not positions:
+        raise ValueError('No frames requested')
+    return list(dict.fromkeys(positions))
 
 
 @app.route('/')
@@ -793,46 +2441,592 @@ def index():
     return HTML
 
 
-@app.route('/generate', methods=['POST'])
-def generate():
-    data = request.get_json()
-    text = data.get('text', '')
+class FrameFit:
+    """Predicate for whether a payload fits one symbol: size(payload) <= capacity."""
+
+    def __init__(self, size, capacity):
+        self.size = size
+        self.capacity = capacity
+
+    def __call__(self, payload):
+        return self.size(payload) <= self.capacity
+
+
+def frame_fits(fmt, sequence, qr_ecc, geometry=None, binary=False):
+    """FrameFit for one symbol in this sequencing mode.
+
+    ``geometry`` is the pdf417_geometry result for PDF417 jobs, and
+    ``binary`` payloads (compressed chunks, parity) are measured
+    byte-compacted. Parity measured on zero bytes costs what any parity
+    does: QR segments it and PDF417 byte-compacts it the same way.
+    """
+    if fmt == 'qr':
+        extra_bits = QR_APPEND_BITS if sequence == 'append' else 0
+        ecc = ECC_MAP.get(qr_ecc, qrcode.constants.ERROR_CORRECT_M)
+        return FrameFit(lambda p: extra_bits + qr_payload_bits(p),
+                        qrcode.util.BIT_LIMIT_TABLE[ecc][40])
+    capacity = geometry['capacity'] - (MACRO_OVERHEAD if sequence == 'macro' else 0)
+    return FrameFit(lambda p: pdf417_codeword_count(p, binary), capacity)
+
+
+def split_document(text, fmt, chunk_size, sequence, qr_ecc, geometry=None):
+    """Chunk the (normalized, possibly compressed) document for one sequencing mode.
+
+    Returns (chunks, resplit): fixed-size chunks that would overflow are
+    split further before anything is encoded, and resplit counts them.
+    """
+    fits = frame_fits(fmt, sequence, qr_ecc, geometry, isinstance(text, bytes))
+    # Compact headers cost the same for any digits, so the job id and CRC can wait
+    header = {'text': frame_header, 'compact': compact_header}.get(sequence)
+    if chunk_size != 'auto':
+        return heal_chunks(chunk_text(text, chunk_size), fits, header)
+
+    # Pack every frame up to the symbol's real capacity
+    if header:
+        return chunk_for_frames(text, fits, header), 0
+    return chunk_to_capacity(text, text[:0], fits), 0
+
+
+def symbol_settings(data):
+    """Symbol options from a request: (fmt, opts, geometry, security_level, floor).
+
+    opts is what every job of the request carries; geometry is the
+    pdf417_geometry result, or None for QR.
+    """
     fmt = data.get('format', 'pdf417').lower()
-    chunk_size = int(data.get('chunk_size', 1180))
     scale = int(data.get('scale', 4))
-    qr_ecc = data.get('qr_ecc', 'M')
+    png_profile = data.get('png_profile', 'fast')
+    columns = data.get('columns', PDF417_COLUMNS)
+    display = data.get('display')
+    security_level = data.get('security_level', PDF417_SECURITY_LEVEL)
+    security_floor = max(0, min(int(data.get('security_floor', 0)), 8))
 
-    if not text:
-        return jsonify({'error': 'No text provided'})
-
-    # Clamp chunk size to reasonable bounds
     if fmt == 'qr':
-        chunk_size = max(50, min(chunk_size, 2800))
-    else:
-        chunk_size = max(50, min(chunk_size, 1800))
+        opts = {'scale': scale, 'png_profile': png_profile, 'qr_ecc': data.get('qr_ecc', 'M')}
+        return fmt, opts, None, security_level, security_floor
+
+    # Scanner constraint: never render modules narrower than min_module px
+    scale = max(scale, int(data.get('min_module', 1)))
+    if columns != 'auto':
+        columns = max(1, min(int(columns), PDF417_MAX_COLUMNS))
+    if display is not None:
+        try:
+            display = (int(display['width']), int(display['height']))
+        except (KeyError, TypeError, ValueError):
+            raise ValueError('display needs a numeric width and height in pixels') from None
+    if security_level != 'auto':
+        security_level = max(0, min(int(security_level), 8))
+    geometry = pdf417_geometry(scale, columns, display, security_level, security_floor)
+    opts = {'scale': scale, 'png_profile': png_profile, 'columns': geometry['columns']}
+    return fmt, opts, geometry, security_level, security_floor
+
+
+def prepare_jobs(data):
+    """Turn a /generate request body into (headers, jobs, meta).
+
+    meta holds the job-wide settings and stats echoed back in every response.
+    """
+    text = data.get('text', '')
+    chunk_size = data.get('chunk_size', 1180)
+    codec = data.get('compress', 'none')
+    sequence = data.get('sequence', 'text')
+    qr_mask = data.get('qr_mask', 'auto')
+    fec = float(data.get('fec', 0))
+
+    if not text:
+        raise ValueError('No text provided')
+    fmt, opts, geometry, security_level, security_floor = symbol_settings(data)
+    qr_ecc = opts.get('qr_ecc')
+    if sequence == 'stream':
+        raise ValueError('Streamed sequences are sent to /generate/pipe')
+    if sequence == 'macro' and fmt == 'qr':
+        raise ValueError('Macro PDF417 sequencing requires the PDF417 format')
+    if sequence == 'append' and fmt != 'qr':
+        raise ValueError('Structured Append sequencing requires the QR format')
+    if not 0 <= fec <= 1:
+        raise ValueError('Parity ratio must be between 0 and 1')
+    if sequence not in ('text', 'compact', 'macro', 'append'):
+        raise ValueError(f'Unknown sequencing mode: {sequence}')
+    if fec and sequence not in ('text', 'compact'):
+        raise ValueError('Parity frames need text or compact header sequencing')
+
+    meta = {'png_profile': opts['png_profile'], 'sequence': sequence}
+    if geometry:
+        meta['pdf417'] = geometry
 
     # Normalize line endings before encoding
     text = normalize_line_endings(text)
 
-    chunks = chunk_text(text, chunk_size)
+    if codec != 'none':
+        size_in = len(text.encode('utf-8'))
+        text, codec = compress_document(text, codec)
+        meta['compression'] = {'codec': codec, 'bytes_in': size_in, 'bytes_out': len(text)}
+
+    if chunk_size != 'auto':
+        # Clamp chunk size to reasonable bounds
+        chunk_size = int(chunk_size)
+        if fmt == 'qr':
+            chunk_size = max(50, min(chunk_size, 2800))
+        else:
+            chunk_size = max(50, min(chunk_size, 1800))
+
+    chunks, resplit = split_document(text, fmt, chunk_size, sequence, qr_ecc, geometry)
+    if sequence == 'append' and len(chunks) > QR_APPEND_MAX_SYMBOLS:
+        # Too long for one Structured Append set: number the frames in text instead
+        meta['structured_append'] = {
+            'fallback': f'{len(chunks)} frames exceed the {QR_APPEND_MAX_SYMBOLS}-symbol limit'}
+        sequence = meta['sequence'] = 'text'
+        chunks, resplit = split_document(text, fmt, chunk_size, sequence, qr_ecc)
+    if resplit:
+        meta['resplit'] = resplit
     total = len(chunks)
 
-    results = []
-    for i, chunk in enumerate(chunks):
-        header = f'[{i+1:03d}/{total:03d}]'
-        payload = header + chunk
+    headers = [frame_header(i + 1, total) for i in range(total)]
+    # Compressed output is arbitrary bytes: byte compaction packs 6 into 5 codewords
+    data_opts = {**opts, 'binary': True} if fmt != 'qr' and isinstance(text, bytes) else opts
+    if sequence == 'macro':
+        # The sequence lives in each symbol's control block; headers are display labels only
+        if total > MACRO_MAX_SEGMENTS:
+            raise ValueError(f'Macro PDF417 supports at most {MACRO_MAX_SEGMENTS} segments')
+        file_id = macro_file_id(text)
+        meta['file_id'] = file_id
+        jobs = [(fmt, chunk, {**data_opts, 'macro': (i, total, file_id)}) for i, chunk in enumerate(chunks)]
+    elif sequence == 'append':
+        parity = qr_append_parity(text)
+        gain = 8 * len(headers[0]) - QR_APPEND_BITS
+        meta['structured_append'] = {'symbols': total, 'parity': parity, 'gain_bits_per_frame': gain}
+        jobs = [(fmt, chunk, {**opts, 'append': (i, total, parity)}) for i, chunk in enumerate(chunks)]
+    else:
+        if sequence == 'compact':
+            job_id = compact_job_id(text)
+            meta['job_id'] = job_id
+            headers = [compact_header(i + 1, total, job_id, chunk) for i, chunk in enumerate(chunks)]
+        if isinstance(text, bytes):
+            jobs = [(fmt, header.encode('ascii') + chunk, data_opts) for header, chunk in zip(headers, chunks)]
+        else:
+            jobs = [(fmt, header + chunk, opts) for header, chunk in zip(headers, chunks)]
+
+    if fec:
+        groups, rows = fec_layout(total, fec)
+        if sequence == 'compact':
+            widest = lambda n, count: compact_header(n, count, kind=COMPACT_PARITY)
+        else:
+            widest = parity_header
+        binary_fits = frame_fits(fmt, sequence, qr_ecc, geometry, binary=True)
+        # Size pieces for the rows' header width, again if the pieces widen it
+        count = sum(rows)
+        while True:
+            parity = fec_parity(chunks, fec, fec_piece_size(binary_fits, widest, count))
+            if len(widest(len(parity), len(parity))) <= len(widest(count, count)):
+                break
+            count = len(parity)
+        meta['fec'] = {'ratio': fec, 'groups': groups, 'parity_rows': sum(rows),
+                       'parity_frames': len(parity)}
+        if sequence == 'compact':
+            parity_headers = [compact_header(n + 1, len(parity), job_id, body, COMPACT_PARITY)
+                              for n, body in enumerate(parity)]
+        else:
+            parity_headers = [parity_header(n + 1, len(parity)) for n in range(len(parity))]
+        headers += parity_headers
+        parity_opts = opts if fmt == 'qr' else {**opts, 'binary': True}
+        jobs += [(fmt, header.encode('ascii') + body, parity_opts)
+                 for header, body in zip(parity_headers, parity)]
+
+    if fmt != 'qr':
+        jobs, meta['pdf417']['security'] = pdf417_assign_levels(jobs, security_level, security_floor)
+
+    if fmt == 'qr' and qr_mask != 'auto':
+        version, mask = qr_pin_settings(jobs, qr_ecc, qr_mask)
+        meta['qr'] = {'version': version, 'mask': mask}
+        jobs = [(f, payload, {**o, 'qr_version': version, 'qr_mask': mask}) for f, payload, o in jobs]
+    return headers, jobs, meta
+
+
+def pdf417_assign_levels(jobs, security_level, floor=0):
+    """Give every PDF417 job a concrete security level; returns (jobs, report).
+
+    With 'auto' each frame gets the recommended level for its own data
+    size. The report compares the ECC spent against one job-wide level high
+    enough for the largest frame, which is what a fixed setting would need.
+    """
+    if security_level == 'auto':
+        levels = [pdf417_auto_level(pdf417_data_count(payload, opts.get('macro'), opts.get('binary', False)),
+                                    floor)
+                  for _, payload, opts in jobs]
+    else:
+        levels = [security_level] * len(jobs)
+    ecc = [2 ** (level + 1) for level in levels]
+    report = {
+        'level': security_level,
+        'floor': floor,
+        'frames_per_level': {level: levels.count(level) for level in sorted(set(levels))},
+        'ecc_codewords': sum(ecc),
+        'ecc_saved_codewords': max(ecc) * len(ecc) - sum(ecc),
+    }
+    jobs = [(fmt, payload, {**opts, 'security_level': level})
+            for (fmt, payload, opts), level in zip(jobs, levels)]
+    return jobs, report
+
+
+# ─── Capacity planning ───
+# PNG bytes per byte of distinct module rows ~ a + b * scale. Fitted against
+# rendered frames; good to about 15%.
+PNG_SIZE_MODEL = {
+    ('pdf417', 'fast'):  (0.55, 0.55),
+    ('pdf417', 'small'): (0.8, 0.25),
+    ('qr', 'fast'):      (0.8, 0.3),
+    ('qr', 'small'):     (0.9, 0.19),
+}
+# JSON around each base64 frame in a /generate response, besides the header
+FRAME_JSON_OVERHEAD = 40
 
-        try:
-            if fmt == 'qr':
-                img_b64 = encode_qr(payload, scale, qr_ecc)
-            else:
-                img_b64 = encode_pdf417(payload, scale)
-        except Exception as e:
-            return jsonify({'error': f'Encoding failed on chunk {i+1}: {str(e)}'})
 
-        results.append({'header': header, 'image': img_b64})
+def plan_symbol(job):
+    """(rows, columns, width, height) of a job's symbol, without encoding it.
+
+    rows x columns counts codewords for PDF417 and modules for QR; width and
+    height are pixels. Raises the same errors encoding would.
+    """
+    fmt, payload, opts = job
+    if fmt == 'qr':
+        version = opts.get('qr_version') or qr_payload_version(payload, opts['qr_ecc'], opts.get('append'))
+        modules = 17 + 4 * version
+        side = (modules + 2 * 4) * opts['scale']
+        return modules, modules, side, side
+    columns, security_level = pdf417_shape(opts)
+    ec_count = 2 ** (security_level + 1)
+    data_count = pdf417_data_count(payload, opts.get('macro'), opts.get('binary', False))
+    rows = max(math.ceil((data_count + ec_count) / columns), pdf417gen.encoding.MIN_ROWS)
+    validate_barcode_size(rows * columns - ec_count, rows)
+    return (rows, columns) + pdf417_symbol_size(columns, rows, opts['scale'])
+
+
+def estimate_png_bytes(job, rows, columns):
+    fmt, _, opts = job
+    # Unknown profiles render as 'fast' (see png_bytes), so estimate them that way
+    profile = opts['png_profile'] if opts['png_profile'] in PNG_PROFILES else 'fast'
+    a, b = PNG_SIZE_MODEL[('qr' if fmt == 'qr' else 'pdf417', profile)]
+    # Bits in one pixel row per module row: quiet zone and row patterns included
+    width = columns + 2 * 4 if fmt == 'qr' else 17 * (columns + 3) + 18
+    return int(rows * width / 8 * (a + b * opts['scale']))
+
+
+# ─── Streaming ingest ───
+# /generate/pipe reads its body this much at a time. Servers may block until
+# a read is full, so keep it under one frame's worth of text.
+PIPE_READ_BYTES = 1024
+
+
+def stream_text(pieces):
+    """Decode UTF-8 byte pieces and normalize their line endings as they arrive.
+
+    A trailing CR is held back until the next piece shows whether it starts a CRLF.
+    """
+    decoder = codecs.getincrementaldecoder('utf-8')('replace')
+    pending = ''
+    for piece in pieces:
+        text = pending + decoder.decode(piece)
+        pending = '\r' if text.endswith('\r') else ''
+        text = text[:len(text) - len(pending)]
+        if text:
+            yield normalize_line_endings(text)
+    text = pending + decoder.decode(b'', final=True)
+    if text:
+        yield normalize_line_endings(text)
+
+
+class StreamChunker:
+    """Cuts text arriving in pieces into numbered stream frames.
+
+    A frame is cut as soon as the buffered text overflows it, so no more
+    than about one frame plus the latest piece is held at a time.
+    """
+
+    def __init__(self, fits, job=0):
+        self.fits = fits
+        self.job = job
+        self.buffer = ''
+        self.n = 1
+        self.guess = 256
+
+    def _next_chunk(self):
+        if not self.buffer:
+            return ''
+        return chunk_to_capacity(self.buffer, stream_header(self.n), self.fits,
+                                 limit=1, guess=self.guess)[0]
+
+    def _frame(self, chunk, final=False):
+        header = stream_header(self.n, self.job, chunk, final)
+        self.buffer = self.buffer[len(chunk):]
+        self.n += 1
+        self.guess = len(chunk) or self.guess
+        return header, chunk
+
+    def feed(self, text):
+        """Add text; returns the (header, chunk) frames it completed."""
+        self.buffer += text
+        frames = []
+        while self.buffer:
+            chunk = self._next_chunk()
+            if len(chunk) == len(self.buffer):
+                break  # more text may still fit in this frame
+            frames.append(self._frame(chunk))
+        return frames
+
+    def finish(self):
+        """The remaining frames, the last one marked final (it may be empty)."""
+        frames = []
+        while True:
+            chunk = self._next_chunk()
+            final = len(chunk) == len(self.buffer)
+            frames.append(self._frame(chunk, final))
+            if final:
+                return frames
+
+
+def sse(event, payload):
+    return f'event: {event}\ndata: {json.dumps(payload)}\n\n'
 
-    return jsonify({'barcodes': results})
+
+@app.route('/generate', methods=['POST'])
+def generate():
+    data = request.get_json()
+    try:
+        headers, jobs, meta = prepare_jobs(data)
+    except ValueError as e:
+        return jsonify({'error': str(e)})
+    mode = data.get('mode', 'base64')
+
+    if mode == 'lazy':
+        job = LazyJob(headers, jobs, meta, max(0, int(data.get('lookahead', 8))))
+        JOBS.put(job.id, job)
+        return jsonify(job.manifest())
+
+    frames = []
+    try:
+        for png in encode_frames(jobs):
+            frames.append(png)
+    except Exception as e:
+        return jsonify({'error': f'Encoding failed on chunk {len(frames)+1}: {str(e)}'})
+
+    if mode == 'job':
+        job = Job(headers, frames, meta)
+        JOBS.put(job.id, job)
+        return jsonify(job.manifest())
+
+    # Keep the payloads so missed frames can be re-sent without the text
+    job = PayloadJob(headers, jobs, meta)
+    JOBS.put(job.id, job)
+    results = [
+        {'header': header, 'image': base64.b64encode(png).decode(), 'bytes': len(png)}
+        for header, png in zip(headers, frames)
+    ]
+    return jsonify({
+        'job': job.id,
+        'barcodes': results,
+        'png_bytes': sum(r['bytes'] for r in results),
+        **meta,
+    })
+
+
+@app.route('/plan', methods=['POST'])
+def plan():
+    """What /generate would produce for this body, from codeword counts alone.
+
+    Chunks measured before come from MEASURE_CACHE, so appending text or
+    changing the scale replans in milliseconds. An edit shifts every chunk after it,
+    and those are measured again: near the start of a large document that
+    costs about as much as the first plan, with fixed chunk sizes or auto.
+    """
+    started = time.perf_counter()
+    data = request.get_json()
+    try:
+        # Searching for a pinned mask means building a symbol; the version is all we need
+        headers, jobs, meta = prepare_jobs({**data, 'qr_mask': 'auto'})
+        symbols = []
+        for job in jobs:
+            try:
+                symbols.append(plan_symbol(job))
+            except Exception as e:
+                raise ValueError(f'Encoding would fail on chunk {len(symbols)+1}: {str(e)}')
+    except ValueError as e:
+        return jsonify({'error': str(e)})
+    if jobs[0][0] == 'qr' and data.get('qr_mask', 'auto') != 'auto':
+        symbols = [max(symbols)] * len(symbols)
+
+    png = [estimate_png_bytes(job, rows, columns) for job, (rows, columns, _, _) in zip(jobs, symbols)]
+    response = sum(4 * math.ceil(n / 3) + len(h) + FRAME_JSON_OVERHEAD for n, h in zip(png, headers))
+    return jsonify({
+        'count': len(jobs),
+        'symbol': {
+            'rows': max(s[0] for s in symbols),
+            'columns': max(s[1] for s in symbols),
+            'unit': 'modules' if jobs[0][0] == 'qr' else 'codewords',
+        },
+        'pixels': {'width': max(s[2] for s in symbols), 'height': max(s[3] for s in symbols)},
+        'png_bytes': sum(png),
+        'response_bytes': response,
+        'elapsed_ms': round((time.perf_counter() - started) * 1000, 1),
+        **meta,
+    })
+
+
+@app.route('/generate/stream', methods=['POST'])
+def generate_stream():
+    """Server-Sent Events: one 'frame' event per barcode, pushed as soon as it is encoded."""
+    try:
+        headers, jobs, meta = prepare_jobs(request.get_json())
+    except ValueError as e:
+        return jsonify({'error': str(e)})
+
+    def events():
+        yield sse('start', {'count': len(jobs), **meta})
+        frames = []
+        try:
+            for header, png in zip(headers, encode_frames(jobs, chunksize=1)):
+                frames.append(png)
+                yield sse('frame', {
+                    'index': len(frames),
+                    'header': header,
+                    'image': base64.b64encode(png).decode(),
+                    'bytes': len(png),
+                })
+        except Exception as e:
+            yield sse('error', {'error': f'Encoding failed on chunk {len(frames)+1}: {str(e)}'})
+            return
+        job = Job(headers, frames, meta)
+        JOBS.put(job.id, job)
+        manifest = job.manifest()
+        del manifest['headers']
+        yield sse('done', manifest)
+
+    return Response(events(), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
+@app.route('/generate/pipe', methods=['POST'])
+def generate_pipe():
+    """Server-Sent Events for a body of unknown length, encoded as it arrives.
+
+    The body is the raw text (send it chunked, e.g. ``curl -T -``) and the
+    settings come from the query string. Stream headers need no total, so
+    frames go out while input is still coming, and memory stays flat: the
+    frames skip the image cache and the sequence is not kept for /jobs.
+    """
+    data = request.args.to_dict()
+    if 'display_width' in data or 'display_height' in data:
+        # A query string has no nested objects, so the display comes in two fields
+        data['display'] = {'width': data.pop('display_width', None),
+                           'height': data.pop('display_height', None)}
+    try:
+        fmt, opts, geometry, security_level, security_floor = symbol_settings(data)
+        if data.get('compress', 'none') != 'none' or float(data.get('fec', 0)):
+            raise ValueError('Compression and parity frames need the whole document; use /generate')
+        if fmt == 'qr' and data.get('qr_mask', 'auto') != 'auto':
+            raise ValueError('Pinning a QR mask needs every frame up front; use qr_mask=auto')
+    except ValueError as e:
+        return jsonify({'error': str(e)})
+
+    fits = frame_fits(fmt, 'stream', opts.get('qr_ecc'), geometry)
+    job_id = uuid.uuid4().int % COMPACT_JOB_IDS
+    meta = {'png_profile': opts['png_profile'], 'sequence': 'stream', 'job_id': job_id}
+    if geometry:
+        meta['pdf417'] = geometry
+    body = request.stream
+
+    def batches():
+        chunker = StreamChunker(fits, job_id)
+        for text in stream_text(iter(lambda: body.read(PIPE_READ_BYTES), b'')):
+            yield chunker.feed(text)
+        yield chunker.finish()
+
+    def events():
+        yield sse('start', meta)
+        count = png_bytes = 0
+        try:
+            for frames in batches():
+                if not frames:
+                    continue
+                jobs = [(fmt, header + chunk, opts) for header, chunk in frames]
+                if fmt != 'qr':
+                    jobs, _ = pdf417_assign_levels(jobs, security_level, security_floor)
+                for (header, _), png in zip(frames, encode_frames(jobs, cache=False)):
+                    count += 1
+                    png_bytes += len(png)
+                    yield sse('frame', {
+                        'index': count,
+                        'header': header,
+                        'image': base64.b64encode(png).decode(),
+                        'bytes': len(png),
+                    })
+        except Exception as e:
+            yield sse('error', {'error': f'Encoding failed on chunk {count+1}: {str(e)}'})
+            return
+        yield sse('done', {'count': count, 'png_bytes': png_bytes, **meta})
+
+    return Response(stream_with_context(events()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
+@app.route('/jobs/<job_id>')
+def job_manifest(job_id):
+    job = JOBS.get(job_id)
+    if job is None:
+        abort(404)
+    return jsonify(job.manifest())
+
+
+@app.route('/jobs/<job_id>/<int:n>.png')
+def job_frame(job_id, n):
+    job = JOBS.get(job_id)
+    if job is None or not 1 <= n <= len(job.headers):
+        abort(404)
+    try:
+        png = job.frame(n)
+    except Exception as e:
+        return jsonify({'error': f'Encoding failed on chunk {n}: {str(e)}'}), 500
+    return Response(png, mimetype='image/png',
+                    headers={'Cache-Control': 'private, max-age=3600'})
+
+
+@app.route('/jobs/<job_id>/resend', methods=['POST'])
+def job_resend(job_id):
+    """Only the listed frames of a retained job, with their original headers."""
+    job = JOBS.get(job_id)
+    if job is None:
+        abort(404)
+    parity = job.meta.get('fec', {}).get('parity_frames', 0)
+    try:
+        numbers = parse_frame_ranges(str(request.get_json().get('frames', '')), len(job.headers), parity)
+    except ValueError as e:
+        return jsonify({'error': str(e)})
+    try:
+        frames = job.frames_at(numbers)
+    except Exception as e:
+        return jsonify({'error': f'Encoding failed: {str(e)}'})
+
+    results = [
+        {'index': n, 'header': job.headers[n - 1], 'image': base64.b64encode(png).decode(), 'bytes': len(png)}
+        for n, png in zip(numbers, frames)
+    ]
+    return jsonify({
+        'job': job.id,
+        'count': len(results),
+        'total': len(job.headers),
+        'barcodes': results,
+        'png_bytes': sum(r['bytes'] for r in results),
+    })
+
+
+@app.route('/stats')
+def stats():
+    return jsonify({
+        'engine': {'name': ENGINE.name, 'workers': ENGINE.workers},
+        'image_cache': IMAGE_CACHE.stats(),
+        'codes_cache': CODES_CACHE.stats(),
+        'measure_cache': MEASURE_CACHE.stats(),
+        'jobs': JOBS.stats(),
+    })
 
 
 if __name__ == '__main__':
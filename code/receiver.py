@@ -0,0 +1,685 @@
+"""Receiver-side tools for barcode sequences produced by app-v5.py.
+
+Runs on the isolated machine, so it only uses the standard library.
+
+    python3 receiver.py listen -o document.txt          # scanner on stdin, any sequence
+    python3 receiver.py decompress payload.bin > document.txt
+    python3 receiver.py rebuild frames/*.bin -o document.txt
+"""
+import argparse
+import binascii
+import bisect
+import codecs
+import functools
+import lzma
+import os
+import re
+import select
+import struct
+import sys
+import time
+import zlib
+
+try:
+    import termios
+except ImportError:  # not on Windows; terminals are then read as they are
+    termios = None
+
+# Must match COMPRESS_MAGIC / CODECS in app-v5.py
+COMPRESS_MAGIC = b'PZ'
+DECOMPRESSORS = {
+    b'z': zlib.decompress,
+    b'x': lzma.decompress,
+}
+
+# Must match frame_header / parity_header / FEC_HEADER / FEC_LENGTH in app-v5.py
+FRAME_HEADER = re.compile(rb'\[(P?)(\d{3,})/(\d{3,})\]')
+FEC_HEADER = struct.Struct('>HHHBHHH')
+FEC_LENGTH = struct.Struct('>H')
+
+# Must match compact_header / stream_header in app-v5.py: kind, width W,
+# W-digit frame number and (except in streams) total, 4-digit job id,
+# 5-digit CRC-16 of the body
+COMPACT_KINDS = {b'1': 'data', b'2': 'parity', b'3': 'more', b'4': 'final'}
+COMPACT_JOB_DIGITS, COMPACT_CRC_DIGITS = 4, 5
+# Where a compact frame can start (12+ digits), and where either form can
+COMPACT_START = re.compile(rb'[1-4][1-9]\d{10,}')
+HEADER_START = re.compile(FRAME_HEADER.pattern + rb'|' + COMPACT_START.pattern)
+
+
+def decompress(data):
+    """Turn a reassembled document payload back into text.
+
+    Payloads without the compression header were sent as plain text and are
+    simply decoded.
+    """
+    if not data.startswith(COMPRESS_MAGIC):
+        return data.decode('utf-8')
+    tag = data[len(COMPRESS_MAGIC):len(COMPRESS_MAGIC) + 1]
+    if tag not in DECOMPRESSORS:
+        raise ValueError(f'Unknown compression codec tag: {tag!r}')
+    return DECOMPRESSORS[tag](data[len(COMPRESS_MAGIC) + 1:]).decode('utf-8')
+
+
+def parse_compact(frame):
+    """(kind, n, total, job, crc, body) from a compact header, or None.
+
+    total is None for a streamed frame with more to follow; a final one is
+    its own total.
+    """
+    kind = COMPACT_KINDS.get(frame[:1])
+    if kind is None or not frame[1:2].isdigit() or frame[1:2] == b'0':
+        return None
+    width = int(frame[1:2])
+    fields = width if kind in ('more', 'final') else 2 * width
+    end = 2 + fields + COMPACT_JOB_DIGITS + COMPACT_CRC_DIGITS
+    digits = frame[2:end]
+    if len(digits) != end - 2 or not digits.isdigit():
+        return None
+    n = int(digits[:width])
+    total = {'more': None, 'final': n}.get(kind, int(digits[width:fields] or 0))
+    job = fields + COMPACT_JOB_DIGITS
+    return kind, n, total, int(digits[fields:job]), int(digits[job:]), frame[end:]
+
+
+def parse_frame(frame):
+    """Split one scanned frame into (kind, n, total, job, body).
+
+    kind is 'data' for [NNN/TOTAL] frames and 'parity' for [PNNN/TOTAL].
+    job is None for those text headers; compact headers carry one, and a
+    frame whose CRC does not match was misread and is refused. Streamed
+    frames come back as 'data', with total None until the final one.
+    """
+    match = FRAME_HEADER.match(frame)
+    if match is not None:
+        kind = 'parity' if match[1] else 'data'
+        return kind, int(match[2]), int(match[3]), None, frame[match.end():]
+    fields = parse_compact(frame)
+    if fields is None:
+        raise ValueError(f'Frame has no sequence header: {frame[:16]!r}')
+    kind, n, total, job, crc, body = fields
+    if binascii.crc_hqx(body, 0) != crc:
+        raise ValueError(f'Frame {n} failed its CRC check; scan it again')
+    return ('parity' if kind == 'parity' else 'data'), n, total, job, body
+
+
+# ─── GF(256) erasure decoding ───
+def _gf_tables():
+    """Exp/log tables for GF(256) with the 0x11d polynomial."""
+    exp, log = [0] * 512, [0] * 256
+    x = 1
+    for i in range(255):
+        exp[i] = exp[i + 255] = x
+        log[x] = i
+        x = (x << 1) ^ (0x11d if x & 0x80 else 0)
+    return exp, log
+
+
+GF_EXP, GF_LOG = _gf_tables()
+
+
+def gf_mul(a, b):
+    if a == 0 or b == 0:
+        return 0
+    return GF_EXP[GF_LOG[a] + GF_LOG[b]]
+
+
+def gf_inv(a):
+    return GF_EXP[255 - GF_LOG[a]]
+
+
+@functools.lru_cache(maxsize=256)
+def _mul_table(c):
+    return bytes(gf_mul(c, x) for x in range(256))
+
+
+def _scaled(vector, c):
+    return vector.translate(_mul_table(c))
+
+
+def _xor(a, b):
+    return (int.from_bytes(a, 'big') ^ int.from_bytes(b, 'big')).to_bytes(len(a), 'big')
+
+
+def gf_invert(matrix):
+    """Inverse of a square GF(256) matrix by Gauss-Jordan elimination."""
+    n = len(matrix)
+    rows = [list(row) + [int(i == r) for i in range(n)] for r, row in enumerate(matrix)]
+    for col in range(n):
+        pivot = next(r for r in range(col, n) if rows[r][col])
+        rows[col], rows[pivot] = rows[pivot], rows[col]
+        inv = gf_inv(rows[col][col])
+        rows[col] = [gf_mul(x, inv) for x in rows[col]]
+        for r in range(n):
+            if r != col and rows[r][col]:
+                factor = rows[r][col]
+                rows[r] = [x ^ gf_mul(factor, y) for x, y in zip(rows[r], rows[col])]
+    return [row[n:] for row in rows]
+
+
+def piece_spans(rows, width, pieces, p):
+    """(row, start, end) byte ranges that parity piece ``p`` carries, in order.
+
+    A group's parity rows are laid end to end and cut into ``pieces`` even
+    pieces, so one piece can end one row and start the next.
+    """
+    size = -(-rows * width // pieces)
+    start, end = p * size, min((p + 1) * size, rows * width)
+    spans = []
+    while start < end:
+        row, a = divmod(start, width)
+        b = min(width, a + end - start)
+        spans.append((row, a, b))
+        start += b - a
+    return spans
+
+
+def piece_segments(rows, width, pieces):
+    """Column boundaries between which every row is wholly in one piece."""
+    bounds = {0, width}
+    for p in range(pieces):
+        for _, a, b in piece_spans(rows, width, pieces, p):
+            bounds.update((a, b))
+    return sorted(bounds)
+
+
+def fec_recover(chunks, parity):
+    """Fill gaps in ``chunks`` (data frame number -> chunk bytes) from parity bodies.
+
+    Only the lost frames are solved for: the frames we have are subtracted
+    from as many parity rows as there are gaps, leaving a small Cauchy
+    system per group and column segment (a missing piece only takes its
+    own columns out of a row). Raises ValueError if a segment has fewer
+    rows than its group lost frames.
+    """
+    total, groups = FEC_HEADER.unpack_from(parity[0])[:2]
+    by_group = {}
+    for body in parity:
+        _, _, g, rows, width, p, pieces = FEC_HEADER.unpack_from(body)
+        by_group.setdefault(g, (rows, width, pieces, {}))[3][p] = body[FEC_HEADER.size:]
+
+    chunks = dict(chunks)
+    for g in range(groups):
+        members = list(range(g + 1, total + 1, groups))
+        lost = [i for i, n in enumerate(members) if n not in chunks]
+        if not lost:
+            continue
+        if g not in by_group:
+            raise ValueError(f'Parity group {g} lost {len(lost)} frames but has no parity frames')
+        rows, width, pieces, received = by_group[g]
+        # Lay the received pieces back out as rows, noting which columns arrived
+        data = [bytearray(width) for _ in range(rows)]
+        arrived = [[] for _ in range(rows)]
+        for p, body in received.items():
+            offset = 0
+            for row, a, b in piece_spans(rows, width, pieces, p):
+                data[row][a:b] = body[offset:offset + b - a]
+                arrived[row].append((a, b))
+                offset += b - a
+        bounds = piece_segments(rows, width, pieces)
+
+        k = len(members)
+        padded = {}
+        for n in members:
+            if n in chunks:
+                row = FEC_LENGTH.pack(len(chunks[n])) + chunks[n]
+                padded[n] = row + bytes(width - len(row))
+        rebuilt = {i: b'' for i in lost}
+        for x, y in zip(bounds, bounds[1:]):
+            usable = [j for j in range(rows) if any(a <= x < b for a, b in arrived[j])][:len(lost)]
+            if len(usable) < len(lost):
+                raise ValueError(f'Parity group {g} lost {len(lost)} frames but has only '
+                                 f'{len(usable)} parity rows for bytes {x}-{y - 1}')
+            syndromes = []
+            for j in usable:
+                vector = bytes(data[j][x:y])
+                for i, n in enumerate(members):
+                    if n in padded:
+                        vector = _xor(vector, _scaled(padded[n][x:y], gf_inv((k + j) ^ i)))
+                syndromes.append(vector)
+
+            inverse = gf_invert([[gf_inv((k + j) ^ i) for i in lost] for j in usable])
+            for s, i in enumerate(lost):
+                row = bytes(y - x)
+                for r, syndrome in enumerate(syndromes):
+                    row = _xor(row, _scaled(syndrome, inverse[s][r]))
+                rebuilt[i] += row
+        for i, row in rebuilt.items():
+            size = FEC_LENGTH.unpack_from(row)[0]
+            chunks[members[i]] = row[FEC_LENGTH.size:FEC_LENGTH.size + size]
+    return chunks
+
+
+# ─── Reassembly ───
+def format_ranges(ranges):
+    """[(5, 5), (30, 35)] -> '5, 30-35'."""
+    return ', '.join(str(a) if a == b else f'{a}-{b}' for a, b in ranges)
+
+
+class Reassembler:
+    """Collects frames of one sequence in any order.
+
+    Each frame costs O(1): a bitmap marks what has arrived, the gap count
+    follows from the two neighbours, and per-group counters say whether
+    parity can cover what is still missing. Missing ranges are only
+    computed when asked for, with C-speed scans over the bitmap.
+
+    Streamed sequences announce their total only in the final frame, so the
+    bitmap grows with the highest frame number seen, and pop_ready() hands
+    over (and forgets) the frames that already follow on in order.
+    """
+
+    def __init__(self):
+        self.total = None
+        self.job = None
+        self.streaming = False
+        self.chunks = []
+        self.have = bytearray()
+        self.popped = 0
+        self.missing = 0
+        self.gaps = 0
+        self.duplicates = 0
+        self.parity = {}
+        self.groups = None
+        self.group_missing = None
+        self.group_parity = None
+        self.segment_rows = None
+        self.short_groups = 0
+
+    def _extend(self, size):
+        """Track frames up to ``size``, all missing until they arrive."""
+        grow = size - len(self.have)
+        if grow <= 0:
+            return
+        if not self.have or self.have[-1]:
+            self.gaps += 1
+        self.have.extend(bytes(grow))
+        self.chunks.extend([None] * grow)
+        self.missing += grow
+
+    def _check(self, total, job):
+        if job is not None:
+            if self.job is None:
+                self.job = job
+            elif job != self.job:
+                raise ValueError(f'Frame belongs to job {job:04d}, not {self.job:04d}')
+        if total is None:
+            self.streaming = True
+        elif self.total is None:
+            if len(self.have) > total:
+                raise ValueError(f'Final frame {total} arrived after frame {len(self.have)}')
+            self.total = total
+            self._extend(total)
+        elif total != self.total:
+            raise ValueError(f'Frame belongs to a {total}-frame sequence, not this {self.total}-frame one')
+
+    def _short(self, g):
+        return self.group_missing[g] > self.group_parity[g]
+
+    def add(self, frame):
+        """Take one scanned frame; returns False for a duplicate."""
+        kind, n, total, job, body = parse_frame(frame)
+        if kind == 'parity':
+            return self._add_parity(body, job)
+        self._check(total, job)
+        if n < 1 or self.total is not None and n > self.total:
+            raise ValueError(f'Frame number {n} is outside 1-{self.total}')
+        self._extend(n)
+
+        i = n - 1
+        if self.have[i]:
+            self.duplicates += 1
+            return False
+        self.have[i] = 1
+        self.chunks[i] = body
+        self.missing -= 1
+        left = i > 0 and not self.have[i - 1]
+        right = i < len(self.have) - 1 and not self.have[i + 1]
+        self.gaps += (left and right) - (not left and not right)
+
+        if self.groups:
+            g = i % self.groups
+            before = self._short(g)
+            self.group_missing[g] -= 1
+            self.short_groups += self._short(g) - before
+        return True
+
+    def _add_parity(self, body, job=None):
+        total, groups, g, rows, width, p, pieces = FEC_HEADER.unpack_from(body)
+        self._check(total, job)
+        if (g, p) in self.parity:
+            self.duplicates += 1
+            return False
+        self.parity[(g, p)] = body
+
+        if self.groups is None:
+            # First parity frame: count what each group is missing, once
+            self.groups = groups
+            self.group_missing = [0] * groups
+            self.group_parity = [0] * groups
+            self.segment_rows = {}
+            i = self.have.find(0)
+            while i != -1:
+                self.group_missing[i % groups] += 1
+                i = self.have.find(0, i + 1)
+            self.short_groups = sum(1 for m in self.group_missing if m)
+        # A group covers as many losses as its least-covered column segment has rows
+        if g not in self.segment_rows:
+            bounds = piece_segments(rows, width, pieces)
+            self.segment_rows[g] = (bounds[:-1], [0] * (len(bounds) - 1))
+        starts, counts = self.segment_rows[g]
+        for _, a, b in piece_spans(rows, width, pieces, p):
+            for i in range(bisect.bisect_left(starts, a), bisect.bisect_left(starts, b)):
+                counts[i] += 1
+        before = self._short(g)
+        self.group_parity[g] = min(counts)
+        self.short_groups += self._short(g) - before
+        return True
+
+    @property
+    def complete(self):
+        """Every data frame is here, or parity can rebuild the rest."""
+        if self.total is None:
+            return False
+        return self.missing == 0 or (self.groups is not None and self.short_groups == 0)
+
+    def missing_ranges(self, limit=None):
+        """Up to ``limit`` (first, last) runs of missing frame numbers.
+
+        Before a stream's final frame only gaps below the highest frame seen count.
+        """
+        ranges = []
+        i = self.have.find(0)
+        while i != -1 and (limit is None or len(ranges) < limit):
+            end = self.have.find(1, i)
+            end = len(self.have) if end == -1 else end
+            ranges.append((i + 1, end))
+            i = self.have.find(0, end)
+        return ranges
+
+    def pop_ready(self):
+        """Payload of the frames that follow on from the last pop, freed once returned."""
+        end = self.have.find(0, self.popped)
+        end = len(self.have) if end == -1 else end
+        ready = b''.join(self.chunks[self.popped:end])
+        self.chunks[self.popped:end] = [None] * (end - self.popped)
+        self.popped = end
+        return ready
+
+    def payload(self):
+        """The joined document payload (less anything popped); raises ValueError while frames are still needed."""
+        if not self.complete:
+            if not self.have:
+                raise ValueError('No frames to reassemble')
+            if self.total is None:
+                raise ValueError(f'The final frame has not arrived yet (last seen: {len(self.have)})')
+            raise ValueError(f'Missing frames: {format_ranges(self.missing_ranges())}')
+        if self.missing:
+            chunks = {i + 1: chunk for i, chunk in enumerate(self.chunks) if chunk is not None}
+            chunks = fec_recover(chunks, list(self.parity.values()))
+            return b''.join(chunks[n] for n in range(1, self.total + 1))
+        return self.pop_ready()
+
+    def status(self, limit=6):
+        if not self.have:
+            return 'waiting for the first frame'
+        total = self.total or f'{len(self.have)}+'
+        line = f'{len(self.have) - self.missing}/{total} frames'
+        if self.parity:
+            line += f' +{len(self.parity)} parity'
+        if self.missing:
+            ranges = format_ranges(self.missing_ranges(limit))
+            more = ', ...' if self.gaps > limit else ''
+            line += f', {self.missing} missing in {self.gaps} gaps: {ranges}{more}'
+        if self.duplicates:
+            line += f', {self.duplicates} duplicates'
+        return line
+
+
+def reassemble(frames):
+    """Join scanned frames (headers included, any order, repeats allowed) into the payload."""
+    reassembler = Reassembler()
+    for frame in frames:
+        reassembler.add(frame)
+    return reassembler.payload()
+
+
+class FrameSplitter:
+    """Cuts a scanner byte stream into frames.
+
+    The scanner ends every frame with ``suffix`` (Enter for a keyboard
+    wedge). Frames may contain that byte themselves, so a frame only ends
+    where the suffix is followed by the next sequence header, at end of
+    input, or when the scanner goes quiet on a compact frame whose CRC
+    checks out (flush). Only headers of the form
+    the first frame used count, so a document line of digits never ends a
+    text-header frame.
+    """
+
+    # Longest header prefix worth keeping while no header has been seen
+    MAX_HEADER = 32
+
+    def __init__(self, suffix=b'\n'):
+        self.suffix = suffix
+        self.header = HEADER_START  # narrowed to one form by the first frame
+        self.boundary = None
+        self.buffer = b''
+
+    def _use(self, header):
+        self.header = header
+        self.boundary = re.compile(re.escape(self.suffix) + b'(?=' + header.pattern + b')')
+
+    def feed(self, data):
+        """Add input; returns the frames it completed."""
+        self.buffer += data
+        start = self.header.search(self.buffer)
+        if start is not None and self.boundary is None:
+            text = FRAME_HEADER.match(self.buffer, start.start())
+            self._use(FRAME_HEADER if text else COMPACT_START)
+        if start is None:
+            # Keep a possible partial header, drop anything before it
+            self.buffer = self.buffer[-self.MAX_HEADER:]
+            return []
+        frames, pos = [], start.start()
+        for match in self.boundary.finditer(self.buffer, pos):
+            frame = self.buffer[pos:match.start()]
+            if self._ends_here(frame, self.buffer[match.end():]):
+                frames.append(frame)
+                pos = match.end()
+        self.buffer = self.buffer[pos:]
+        return frames
+
+    @staticmethod
+    def _ends_here(frame, rest):
+        """Whether the header that follows ``frame`` really starts the next one.
+
+        Document text can contain a line of digits that looks like a compact
+        header. A compact frame ends there only if its CRC checks out, or if
+        the next header carries the same job id (so this frame was misread).
+        Text frames only meet text headers here.
+        """
+        fields = parse_compact(frame)
+        if fields is None or binascii.crc_hqx(fields[5], 0) == fields[4]:
+            return True
+        following = parse_compact(rest)
+        return following is not None and following[3] == fields[3]
+
+    def flush(self, final=True):
+        """Treat whatever is buffered as a finished frame.
+
+        After a mere pause (``final`` false) only a compact frame that passes
+        its CRC is taken: a text frame cannot tell it is whole, so it waits
+        for the next header or the end of input.
+        """
+        frame = self.buffer
+        if frame.endswith(self.suffix):
+            frame = frame[:-len(self.suffix)]
+        if not final and self.header.match(frame):
+            fields = parse_compact(frame)
+            if fields is None or binascii.crc_hqx(fields[5], 0) != fields[4]:
+                return []
+        self.buffer = b''
+        return [frame] if self.header.match(frame) else []
+
+
+# Ctrl-D, which a raw terminal passes through as a byte
+TTY_EOF = b'\x04'
+
+
+def raw_terminal(fd):
+    """Switch a terminal to byte-at-a-time input; returns the settings to restore.
+
+    A cooked terminal hands over whole lines and turns CR into LF, which
+    would corrupt the document. Echo goes too, so scans don't bury the
+    status line; Ctrl-C still interrupts.
+    """
+    saved = termios.tcgetattr(fd)
+    attrs = termios.tcgetattr(fd)
+    attrs[0] &= ~(termios.ICRNL | termios.INLCR | termios.IGNCR | termios.IXON)
+    attrs[3] &= ~(termios.ICANON | termios.ECHO | termios.IEXTEN)
+    attrs[6][termios.VMIN], attrs[6][termios.VTIME] = 1, 0
+    termios.tcsetattr(fd, termios.TCSADRAIN, attrs)
+    return saved
+
+
+def listen(stream, suffix=None, idle=0.5, log=sys.stderr, sink=None):
+    """Reassemble frames from a live byte stream; returns the Reassembler.
+
+    Stops as soon as the sequence is complete, or at end of input (Ctrl-D
+    on a terminal). A pause of ``idle`` seconds ends a compact frame in
+    progress, so the last scan does not wait for another one; a text frame
+    waits for the next scan or the end of input. Streamed sequences are
+    written to ``sink`` as soon as each frame follows on from the ones
+    before it. ``suffix`` defaults to CR on a terminal (Enter) and LF
+    otherwise.
+    """
+    fd = stream.fileno()
+    tty = termios is not None and os.isatty(fd)
+    if suffix is None:
+        suffix = b'\r' if tty else b'\n'
+    saved = raw_terminal(fd) if tty else None
+    try:
+        return _listen(fd, tty, suffix, idle, log, sink)
+    finally:
+        if saved is not None:
+            termios.tcsetattr(fd, termios.TCSADRAIN, saved)
+
+
+def _listen(fd, tty, suffix, idle, log, sink):
+    reassembler, splitter = Reassembler(), FrameSplitter(suffix)
+    shown, eof = 0.0, False
+    while not reassembler.complete and not eof:
+        try:
+            ready = select.select([fd], [], [], idle)[0]
+        except (OSError, ValueError):
+            ready = [fd]  # select() cannot poll this stream here; block instead
+        if not ready:
+            frames = splitter.flush(final=False)
+        else:
+            data = os.read(fd, 65536)
+            if tty and TTY_EOF in data:
+                data, eof = data[:data.index(TTY_EOF)], True
+            else:
+                eof = not data
+            frames = splitter.feed(data)
+            if eof:
+                frames += splitter.flush()
+        for frame in frames:
+            try:
+                reassembler.add(frame)
+            except ValueError as e:
+                log.write(f'\nskipped frame: {e}\n')
+        if sink is not None and reassembler.streaming:
+            sink.write(reassembler.pop_ready())
+        now = time.monotonic()
+        if frames and (now - shown > 0.2 or reassembler.complete):
+            # Text frames carry no length, so the last scan waits for Ctrl-D
+            text = tty and splitter.header is FRAME_HEADER and not reassembler.complete
+            hint = ' (Ctrl-D after the last scan)' if text else ''
+            log.write('\r\033[K' + reassembler.status() + hint)
+            log.flush()
+            shown = now
+    log.write('\n')
+    return reassembler
+
+
+def write_text(text, output):
+    if output:
+        with open(output, 'w', encoding='utf-8', newline='') as f:
+            f.write(text)
+    else:
+        # Line endings are already CRLF; bypass newline translation
+        sys.stdout.buffer.write(text.encode('utf-8'))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p = sub.add_parser('listen', help='reassemble frames as the scanner types them')
+    p.add_argument('input', nargs='?', default='-', help="scanner capture file, or '-' for stdin")
+    p.add_argument('-o', '--output', help='write text here instead of stdout')
+    p.add_argument('--suffix', help=r"what the scanner sends after each frame "
+                                    r"(default '\r' on a terminal, else '\n')")
+    p.add_argument('--idle', type=float, default=0.5, help='seconds of silence that end a frame')
+    p.add_argument('--raw', action='store_true', help='write the payload bytes without decompressing')
+
+    p = sub.add_parser('decompress', help='decode a reassembled (headers stripped) payload')
+    p.add_argument('input', help="payload file, or '-' for stdin")
+    p.add_argument('-o', '--output', help='write text here instead of stdout')
+
+    p = sub.add_parser('rebuild', help='reassemble scanned frames, one file per frame')
+    p.add_argument('frames', nargs='+', help='frame files, headers included, in any order')
+    p.add_argument('-o', '--output', help='write text here instead of stdout')
+
+    args = parser.parse_args(argv)
+
+    if args.command == 'listen':
+        suffix = None
+        if args.suffix is not None:
+            suffix = codecs.decode(args.suffix, 'unicode_escape').encode('latin-1')
+        source = sys.stdin.buffer if args.input == '-' else open(args.input, 'rb')
+        # Streamed sequences are written while they arrive, so the output
+        # builds up beside the target and only replaces it once complete
+        partial = args.output + '.partial' if args.output else None
+        sink = open(partial, 'wb') if partial else sys.stdout.buffer
+        complete = False
+        try:
+            reassembler = listen(source, suffix, args.idle, sink=sink)
+            if not reassembler.complete:
+                sys.stderr.write(reassembler.status(limit=50) + '\n')
+                return 1
+            payload = reassembler.payload()
+            # Streams are never compressed; line endings are already CRLF
+            raw = args.raw or reassembler.streaming
+            sink.write(payload if raw else decompress(payload).encode('utf-8'))
+            complete = True
+        finally:
+            if source is not sys.stdin.buffer:
+                source.close()
+            if partial:
+                sink.close()
+                if complete:
+                    os.replace(partial, args.output)
+                elif os.path.getsize(partial):
+                    sys.stderr.write(f'incomplete; received text kept in {partial}\n')
+                else:
+                    os.remove(partial)
+    elif args.command == 'decompress':
+        if args.input == '-':
+            data = sys.stdin.buffer.read()
+        else:
+            with open(args.input, 'rb') as f:
+                data = f.read()
+        write_text(decompress(data), args.output)
+    elif args.command == 'rebuild':
+        frames = []
+        for path in args.frames:
+            with open(path, 'rb') as f:
+                frames.append(f.read())
+        write_text(decompress(reassemble(frames)), args.output)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
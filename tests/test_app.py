@@ -0,0 +1,94 @@
+"""Checks that app-v5.py's fast paths match the libraries and decoder they stand in for."""
+import importlib.util
+import os
+import random
+import sys
+import unittest
+
+import numpy as np
+import pdf417gen
+import qrcode
+from pdf417gen.compaction import compact
+from pdf417gen.encoding import MAX_CODE_WORDS, compute_error_correction_code_words
+
+CODE = os.path.join(os.path.dirname(__file__), '..', 'code')
+sys.path.insert(0, CODE)
+
+import receiver  # noqa: E402
+
+# The file name is not an importable module name
+spec = importlib.util.spec_from_file_location('app_v5', os.path.join(CODE, 'app-v5.py'))
+app = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(app)
+
+SAMPLE = ('Invoice #2024-00017, due 31.12.2024\r\n'
+          'Total: EUR 1.234,56 (incl. 19% VAT) -- ref 4006381333931\r\n'
+          'ID=ab12-CD34; path=/srv/data?q=1&lang=de\t[ok]\r\n')
+
+
+class EccBatchTest(unittest.TestCase):
+    def test_matches_pdf417gen_at_every_level(self):
+        rng = random.Random(15438)
+        for level in range(9):
+            longest = MAX_CODE_WORDS - 2 ** (level + 1)
+            words = [[rng.randrange(929) for _ in range(size)]
+                     for size in (1, 2, 7, rng.randrange(3, longest), longest)]
+            expected = [list(compute_error_correction_code_words(w, level)) for w in words]
+            self.assertEqual(app.pdf417_ecc_batch(words, level), expected, f'level {level}')
+
+
+class CompactLengthTest(unittest.TestCase):
+    def test_counts_what_compact_builds(self):
+        rng = random.Random(900)
+        pieces = [b'a', b'B', b'7', b' ', b'\r\n', b'\t', b'.', b'#', b'~', b'\xc3\xa9', b'\x00',
+                  b'0' * 12, b'0' * 13, b'9' * 50]
+        samples = [b'', SAMPLE.encode()]
+        samples += [b''.join(rng.choice(pieces) for _ in range(rng.randrange(60))) for _ in range(2000)]
+        samples += [bytes(rng.randrange(256) for _ in range(rng.randrange(60))) for _ in range(500)]
+        for data in samples:
+            self.assertEqual(app.pdf417_compact_length(data), len(list(compact(data))), data)
+
+
+class RenderTest(unittest.TestCase):
+    def test_pdf417_pixels_match_render_image(self):
+        for columns, level, scale in ((3, 2, 1), (6, 5, 2), (12, 0, 3)):
+            codes = app.pdf417_codes(SAMPLE, columns=columns, security_level=level)
+            ours = np.asarray(app.render_pdf417_image(codes, scale))
+            theirs = np.asarray(pdf417gen.render_image(codes, scale=scale, ratio=app.PDF417_ROW_HEIGHT,
+                                                       padding=app.PDF417_PADDING).convert('L'))
+            np.testing.assert_array_equal(ours, theirs)
+
+    def test_qr_pixels_match_make_image(self):
+        for box_size, ecc in ((1, qrcode.constants.ERROR_CORRECT_L), (4, qrcode.constants.ERROR_CORRECT_H)):
+            qr = qrcode.QRCode(error_correction=ecc, box_size=box_size, border=4)
+            qr.add_data(SAMPLE)
+            qr.make(fit=True)
+            ours = np.asarray(app.render_qr_image(qr.modules, box_size, 4))
+            theirs = np.asarray(qr.make_image().get_image().convert('1'))
+            np.testing.assert_array_equal(ours, theirs)
+
+
+class ParityTest(unittest.TestCase):
+    def test_recover_rebuilds_lost_frames(self):
+        rng = random.Random(255)
+        for count, ratio, piece_size in ((1, 1.0, 40), (12, 0.25, 17), (40, 0.1, 300), (300, 0.05, 64)):
+            chunks = [bytes(rng.randrange(256) for _ in range(rng.randrange(1, 90))) for _ in range(count)]
+            parity = app.fec_parity(chunks, ratio, piece_size)
+            groups, rows = app.fec_layout(count, ratio)
+            kept = {n + 1: chunk for n, chunk in enumerate(chunks)}
+            for g, lost in enumerate(rows):
+                for n in rng.sample(range(g + 1, count + 1, groups), lost):
+                    del kept[n]
+            recovered = receiver.fec_recover(kept, parity)
+            self.assertEqual([recovered[n + 1] for n in range(count)], chunks)
+
+    def test_recover_refuses_too_many_losses(self):
+        chunks = [b'frame %d' % n for n in range(10)]
+        parity = app.fec_parity(chunks, 0.2, 64)
+        kept = {n + 1: chunk for n, chunk in enumerate(chunks) if n > 2}
+        with self.assertRaises(ValueError):
+            receiver.fec_recover(kept, parity)
+
+
+if __name__ == '__main__':
+    unittest.main()
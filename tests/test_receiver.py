@@ -0,0 +1,60 @@
+"""Regression tests for receiver.py's frame splitting."""
+import binascii
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'code'))
+
+import receiver  # noqa: E402
+
+
+def text_frames(document, count):
+    """Split ``document`` into ``count`` [NNN/TOTAL] frames."""
+    size = -(-len(document) // count)
+    return [f'[{n + 1:03d}/{count:03d}]'.encode() + document[n * size:(n + 1) * size]
+            for n in range(count)]
+
+
+class EpochLogTest(unittest.TestCase):
+    # Lines start with millisecond timestamps, which look like compact headers
+    document = b''.join(b'%d INFO worker %02d finished batch in 12 ms\n' % (1712345678901 + i * 37, i)
+                        for i in range(60))
+
+    def test_splitter_keeps_text_frames_whole(self):
+        frames = text_frames(self.document, 3)
+        splitter = receiver.FrameSplitter(b'\n')
+        found = splitter.feed(b'\n'.join(frames) + b'\n') + splitter.flush()
+        self.assertEqual(found, frames)
+
+    def test_listen_rebuilds_document(self):
+        scanned = b''.join(frame + b'\n' for frame in text_frames(self.document, 3))
+        with tempfile.TemporaryFile() as stream, open(os.devnull, 'w') as log:
+            stream.write(scanned)
+            stream.seek(0)
+            reassembler = receiver.listen(stream, idle=0.1, log=log)
+        self.assertTrue(reassembler.complete)
+        self.assertEqual(reassembler.payload(), self.document)
+
+
+class IdleFlushTest(unittest.TestCase):
+    def test_pause_does_not_end_text_frame(self):
+        splitter = receiver.FrameSplitter(b'\r')
+        self.assertEqual(splitter.feed(b'[001/001]first line\r'), [])
+        self.assertEqual(splitter.flush(final=False), [])
+        splitter.feed(b'second line\r')
+        self.assertEqual(splitter.flush(), [b'[001/001]first line\rsecond line'])
+
+    def test_pause_ends_compact_frame_once_crc_checks_out(self):
+        body = b'first line\rsecond line'
+        frame = b'11110042%05d' % binascii.crc_hqx(body, 0) + body
+        splitter = receiver.FrameSplitter(b'\r')
+        splitter.feed(frame[:-5])
+        self.assertEqual(splitter.flush(final=False), [])
+        splitter.feed(frame[-5:] + b'\r')
+        self.assertEqual(splitter.flush(final=False), [frame])
+
+
+if __name__ == '__main__':
+    unittest.main()